@@ -5,6 +5,8 @@ from urllib.parse import quote_plus
 from bson import ObjectId
 import gridfs
 import os
+from transcription import transcript_cache_stats
+from model_pool import model_pool
 
 def get_connection():
     username = os.getenv("MONGODB_USERNAME")
@@ -56,9 +58,10 @@ def admin_panel():
             exp = st.expander("⬇️ View Recent Files")
             with exp:
                 for idx, item in enumerate(st.session_state.history):
-                    st.markdown(f"**🎮 {item['video_name']}**", unsafe_allow_html=True)
+                    st.markdown(f"**🎮 {item['video_name'] or item['srt_name']}**", unsafe_allow_html=True)
                     st.download_button("📄 Subtitle", item['srt_data'], file_name=item['srt_name'], key=f"srt_admin_{idx}")
-                    st.download_button("🎮 Video", item['video_data'], file_name=item['video_name'], key=f"vid_admin_{idx}")
+                    if item['video_data']:
+                        st.download_button("🎮 Video", item['video_data'], file_name=item['video_name'], key=f"vid_admin_{idx}")
         else:
             st.info("No recent files yet.")
 
@@ -75,6 +78,26 @@ def admin_panel():
         st.session_state.page = "main"
         st.rerun()
 
+    st.markdown("### ♻️ Transcript Cache")
+    stats = transcript_cache_stats()
+    cols = st.columns(4)
+    cols[0].metric("Hits", stats["hits"])
+    cols[1].metric("Misses", stats["misses"])
+    cols[2].metric("Entries", stats["entries"])
+    cols[3].metric("Size", f"{stats['size_mb']} MB")
+    st.caption(f"Counters since server start; {stats['evictions']} entries evicted.")
+
+    st.markdown("### 🧠 Whisper Models")
+    pool = model_pool.stats()
+    st.caption(f"{pool['used_mb']} / {pool['budget_mb']} MB used · {pool['loads']} loads · "
+               f"{pool['evictions']} evictions")
+    for model in pool["models"]:
+        st.markdown(f"`{model['model']}` on {model['device']} · {model['mb']} MB · "
+                    f"{'in use by ' + str(model['in_use']) + ' job(s)' if model['in_use'] else 'idle'}")
+    for reservation in pool["reserved"]:
+        st.markdown(f"`{reservation['name']}` · {reservation['mb']} MB")
+    st.markdown("---")
+
     db = get_connection()
     users = db["users"]
     fs = gridfs.GridFS(db)
@@ -134,7 +157,7 @@ def admin_panel():
             history = user.get("history", [])
             if history:
                 for idx, h in enumerate(history):
-                    st.markdown(f"📄 `{h['srt_name']}` | 🎥 `{h['video_name']}`")
+                    st.markdown(f"📄 `{h['srt_name']}` | 🎥 `{h.get('video_name') or 'audio only'}`")
                     if st.button("🗑️ Delete This History", key=f"del_hist_{username}_{idx}"):
                         users.update_one({"username": username}, {"$pull": {"history": h}})
                         st.success("History entry deleted.")
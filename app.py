@@ -2,11 +2,16 @@
 #                IMPORT REQUIRED MODULES
 # -------------------------------------------------------
 import streamlit as st
-import whisper
 import os
+import logging
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from deep_translator import GoogleTranslator
-from subtitle_generator import get_font_for_text, export_srt, render_subtitles_on_video
+from subtitle_generator import (
+    export_srt, create_subtitled_video, soft_subtitle_output_path,
+    translate_segment_parallel, render_languages, rerender_after_edit, retranslate_edited_segments,
+    ENCODER_PROFILES, DEFAULT_ENCODER_PROFILE, RENDER_ENGINES, OUTPUT_MODES, AUDIO_BACKGROUNDS
+)
 from pymongo import MongoClient
 import bcrypt
 import gridfs
@@ -14,6 +19,12 @@ from bson import ObjectId
 from urllib.parse import quote_plus
 import certifi
 from admin_panel import admin_panel
+from media import get_keyframe_index, probe_media
+from model_pool import model_pool, start_preload
+from transcription import (
+    stream_transcription, stream_parallel_transcription,
+    transcript_cache_key, load_cached_transcript, cache_transcription, PeakMemory
+)
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -21,6 +32,8 @@ load_dotenv()
 from streamlit_cookies_manager import EncryptedCookieManager
 import secrets
 
+logger = logging.getLogger(__name__)
+
 
 # -------------------------------------------------------
 #                  COOKIE SECRET KEY
@@ -60,8 +73,11 @@ def get_connection():
 # -------------------------------------------------------
 #     SAVE A USER’S PROCESSED FILES TO MONGO (GRIDFS)
 # -------------------------------------------------------
-def save_to_gridfs(username, video_path, srt_path):
-    """Store video + srt to GridFS and maintain last 3 items."""
+def save_to_gridfs(username, video_path, srt_path, encoder_profile=None, replace=False):
+    """Store video (if any) + srt to GridFS and maintain last 3 items.
+
+    With replace, an existing history entry for the same SRT name (and its files) is dropped first.
+    """
     db = get_connection()
     if db is None:
         return False
@@ -69,9 +85,23 @@ def save_to_gridfs(username, video_path, srt_path):
     try:
         fs = gridfs.GridFS(db)
 
-        # Upload both files into GridFS
-        with open(video_path, "rb") as v, open(srt_path, "rb") as s:
-            video_id = fs.put(v, filename=os.path.basename(video_path))
+        if replace:
+            srt_name = os.path.basename(srt_path)
+            user = db["users"].find_one({"username": username}) or {}
+            for entry in user.get("history", []):
+                if entry.get("srt_name") == srt_name:
+                    for file_id in (entry.get("video_file_id"), entry.get("srt_file_id")):
+                        if file_id:
+                            fs.delete(ObjectId(file_id))
+            db["users"].update_one({"username": username}, {"$pull": {"history": {"srt_name": srt_name}}})
+
+        # Upload both files into GridFS (audio jobs may have no video)
+        video_id = None
+        if video_path:
+            with open(video_path, "rb") as v:
+                video_id = fs.put(v, filename=os.path.basename(video_path),
+                                  metadata={"encoder_profile": encoder_profile})
+        with open(srt_path, "rb") as s:
             srt_id = fs.put(s, filename=os.path.basename(srt_path))
 
         # Push into user history (limit to last 3)
@@ -82,8 +112,9 @@ def save_to_gridfs(username, video_path, srt_path):
                     "$each": [{
                         "video_file_id": video_id,
                         "srt_file_id": srt_id,
-                        "video_name": os.path.basename(video_path),
-                        "srt_name": os.path.basename(srt_path)
+                        "video_name": os.path.basename(video_path) if video_path else None,
+                        "srt_name": os.path.basename(srt_path),
+                        "encoder_profile": encoder_profile
                     }],
                     "$slice": -3
                 }
@@ -117,13 +148,15 @@ def load_recent_history_from_mongo(username, db):
         # Load each file
         for entry in history_items:
             try:
-                video_data = fs.get(ObjectId(entry['video_file_id'])).read()
+                video_data = (fs.get(ObjectId(entry['video_file_id'])).read()
+                              if entry.get('video_file_id') else None)
                 srt_data = fs.get(ObjectId(entry['srt_file_id'])).read()
                 st.session_state.history.append({
                     "video_name": entry['video_name'],
                     "srt_name": entry['srt_name'],
                     "video_data": video_data,
-                    "srt_data": srt_data
+                    "srt_data": srt_data,
+                    "encoder_profile": entry.get('encoder_profile')
                 })
             except:
                 continue
@@ -149,10 +182,20 @@ DEFAULT_SESSION_VALUES = {
     'show_dropdown': False,
     'device': 'GPU',
     'model_size': 'tiny',
+    'quantized': False,
+    'transcribe_mode': 'stream',
+    'output_mode': 'burn',
+    'render_engine': 'python',
+    'render_mode': 'serial',
+    'preview_start': 0,
+    'audio_background': None,
+    'encoder_profile': DEFAULT_ENCODER_PROFILE,
+    'extra_langs': [],
+    'extra_outputs': [],
+    'last_job': None,
     'history': [],
     'is_processing': False,
-    'role': None,
-    'model_loaded': {}
+    'role': None
 }
 
 for key, value in DEFAULT_SESSION_VALUES.items():
@@ -193,23 +236,16 @@ if 'SUPPORTED_LANGS' not in st.session_state:
 
 
 
-#LOAD / CACHE WHISPER MODEL ONCE
+#WHISPER MODELS: one process-wide pool shared by every session
 
-@st.cache_resource(show_spinner="🔄 Loading Whisper Model...")
-def load_whisper_model(model_size="tiny", device="gpu"):
-    os.environ["WHISPER_CACHE_DIR"] = os.path.expanduser("~/.cache/whisper")
-    return whisper.load_model(model_size, device=device)
+start_preload()
 
 
-def get_or_load_model():
-    """Reuse existing model; load only once."""
-    key = f"{st.session_state.model_size}_{st.session_state.device}"
-    if key not in st.session_state.model_loaded:
-        st.session_state.model_loaded[key] = load_whisper_model(
-            model_size=st.session_state.model_size,
-            device="cuda" if st.session_state.device == "GPU (CUDA)" else "cpu"
-        )
-    return st.session_state.model_loaded[key]
+def selected_model_key():
+    """(model size, device, int8 quantized) the current session's jobs run with."""
+    device = "cuda" if st.session_state.device == "GPU (CUDA)" else "cpu"
+    # Quantized inference only exists on CPU
+    return st.session_state.model_size, device, st.session_state.quantized and device == "cpu"
 
 #USER SIGNUP PAGE
 def signup():
@@ -439,10 +475,59 @@ def format_eta(seconds):
 
 
 
+def record_output(video_output_path, srt_path, encoder_profile, replace=False):
+    """Add one finished output to the session history and save it in the DB.
+
+    With replace, the earlier entry for the same output (e.g. before an edit) is replaced.
+    """
+    if replace:
+        srt_name = os.path.basename(srt_path)
+        st.session_state.history = [item for item in st.session_state.history if item['srt_name'] != srt_name]
+    video_data = None
+    if video_output_path:
+        with open(video_output_path, "rb") as f2:
+            video_data = f2.read()
+    with open(srt_path, "rb") as f1:
+        st.session_state.history.insert(0, {
+            "video_name": os.path.basename(video_output_path) if video_output_path else None,
+            "srt_name": os.path.basename(srt_path),
+            "video_data": video_data,
+            "srt_data": f1.read(),
+            "encoder_profile": encoder_profile
+        })
+        st.session_state.history = st.session_state.history[:3]
+
+    # Save history in DB
+    save_to_gridfs(st.session_state.username, video_output_path, srt_path, encoder_profile, replace)
+
+
+def apply_subtitle_edits(edited_rows):
+    """Re-translate edited source lines and re-render only the changed parts."""
+    job = st.session_state.last_job
+    new_source = [{'start': float(row['start']), 'end': float(row['end']), 'text': row['original']}
+                  for row in edited_rows]
+    # Rows whose original text is unchanged keep the (possibly hand-edited) translation
+    edited_translations = [{'start': float(row['start']), 'end': float(row['end']), 'text': row['text']}
+                           for row in edited_rows]
+    old_source = job["source_segments"]
+    if len(old_source) == len(new_source):
+        old_source = [{**old, 'start': new['start'], 'end': new['end']} for old, new in zip(old_source, new_source)]
+    segments = retranslate_edited_segments(old_source, new_source, edited_translations, job["target_code"])
+
+    export_srt(segments, job["srt"])
+    summary = rerender_after_edit(job["source_path"], job["video"], segments, job["font_path"],
+                                  media_info=job["media_info"])
+    job.update(source_segments=new_source, segments=segments)
+    # The history entry still holds the pre-edit files
+    record_output(job["video"], job["srt"], job["encoder_profile"], replace=True)
+    return summary
+
+
 #MAIN VIDEO PROCESSING FUNCTION
 
 def process_video():
     """Main workflow: transcription → translation → SRT → burn subtitles."""
+    leased_model = None
     try:
         st.session_state.is_processing = True
         file = st.session_state.uploaded_file
@@ -455,83 +540,185 @@ def process_video():
             temp_file.write(file.read())
             temp_path = temp_file.name
 
+        # Probe container metadata once; every later stage gets this MediaInfo
+        media_info = probe_media(temp_path)
+        audio_only = media_info.audio_only
+
+        # Index keyframes once at ingest; every later render reuses it
+        if not audio_only:
+            get_keyframe_index(temp_path)
+
         # Estimate time
-        duration = whisper.audio.load_audio(temp_path).shape[0] / whisper.audio.SAMPLE_RATE
+        duration = media_info.duration
         st.markdown(f"🕒 Estimated Time: `{format_eta(estimate_total_time(duration, st.session_state.model_size))}`")
 
         # UI progress bar
         progress_bar = st.progress(0)
         progress = 0
 
-        # Load whisper model
-        model = get_or_load_model()
+        spoken_code = None if spoken_lang == "Auto" else st.session_state.LANG_DICT[spoken_lang]
+        # Same audio, model and settings as an earlier job: skip straight to translation
+        model_size, device, quantized = selected_model_key()
+        cache_key = transcript_cache_key(temp_path, model_size + ("-int8" if quantized else ""), spoken_code,
+                                         mode=st.session_state.transcribe_mode)
+        cached = load_cached_transcript(cache_key)
+        if cached:
+            st.info("♻️ Reusing the transcript from an earlier run of this file.")
+            windows = [{"segments": cached["segments"], "language": cached["language"], "position": duration}]
+        elif st.session_state.transcribe_mode == "parallel":
+            # Worker processes load their own model copies
+            windows = stream_parallel_transcription(temp_path, model_size, device=device, language=spoken_code,
+                                                    quantized=quantized)
+        else:
+            # Hold the shared model until transcription is done so it cannot be evicted mid-job
+            leased_model = (model_size, device, quantized)
+            with st.spinner("🔄 Loading Whisper Model..."):
+                model = model_pool.acquire(*leased_model)
+            windows = stream_transcription(model, temp_path, language=spoken_code)
+        if not cached:
+            windows = cache_transcription(windows, cache_key)
         progress_bar.progress(progress := 20)
 
-        # --- Transcription ---
-        transcription = model.transcribe(
-            temp_path,
-            language=None if spoken_lang == "Auto"
-            else st.session_state.LANG_DICT[spoken_lang]
-        )
-        progress_bar.progress(progress := 45)
+        base = os.path.splitext(os.path.basename(temp_path))[0]
+        os.makedirs("output", exist_ok=True)
 
-        # --- Translate segments ---
-        translated_segments = []
-        for seg in transcription['segments']:
-            try:
-                translated = GoogleTranslator(
-                    source='auto',
-                    target=st.session_state.LANG_DICT[target_lang]
-                ).translate(seg['text'])
-            except:
-                translated = "[Translation Failed]"
-            translated_segments.append({
-                'start': seg['start'],
-                'end': seg['end'],
-                'text': translated
-            })
+        # --- Extra languages (burn-in only; rendered from the same decode) ---
+        extra_langs = [lang for lang in st.session_state.extra_langs if lang != target_lang]
+        if st.session_state.output_mode != "burn":
+            extra_langs = []
+        translate_to = [target_lang] + extra_langs
+
+        # --- Transcription, streamed window by window ---
+        # Each finished window is shown live, saved as a partial SRT and handed
+        # to the translators while the next window is still being transcribed.
+        st.markdown("#### 📝 Live Transcript")
+        live_transcript = st.empty()
+        partial_download = st.empty()
+        partial_srt_path = f"output/{base}_partial.srt"
+        source_segments = []
+        with PeakMemory() as memory, ThreadPoolExecutor() as translator:
+            translations = {lang: [] for lang in translate_to}
+            for window in windows:
+                for seg in window["segments"]:
+                    source_segments.append(seg)
+                    for lang in translate_to:
+                        translations[lang].append(translator.submit(
+                            translate_segment_parallel, seg, st.session_state.LANG_DICT[lang]))
+                if not window["segments"]:
+                    continue
+
+                live_transcript.markdown("\n\n".join(
+                    f"`{format_eta(int(seg['start']))}` {seg['text'].strip()}" for seg in source_segments[-5:]))
+                export_srt(source_segments, partial_srt_path)
+                with open(partial_srt_path, "rb") as f:
+                    partial_download.download_button(
+                        f"📄 Download transcript so far ({format_eta(int(window['position']))})", f.read(),
+                        file_name=os.path.basename(partial_srt_path), on_click="ignore",
+                        key=f"partial_srt_{len(source_segments)}")
+                progress_bar.progress(20 + int(25 * min(1.0, window["position"] / max(duration, 1))))
+            progress_bar.progress(progress := 45)
+            # Transcription is done; let the pool evict the model while translations finish
+            if leased_model:
+                model_pool.release(*leased_model)
+                leased_model = None
+
+            # --- Translate segments ---
+            translated = {lang: [future.result() for future in futures]
+                          for lang, futures in translations.items()}
+        translated_segments = translated.pop(target_lang)
+        # Peak RSS (app plus transcription workers) for sizing hosts and worker counts
+        logger.info("Transcription of %s (%ds, %s%s, %s): peak RSS %.0f MB, with workers %.0f MB",
+                    file.name, duration, model_size, " int8" if quantized else "", st.session_state.transcribe_mode,
+                    memory.peak_rss_mb, memory.peak_total_rss_mb)
+        st.caption(f"🧠 Peak memory during transcription: {memory.peak_total_rss_mb:.0f} MB")
+        extra_segments = translated
         progress_bar.progress(progress := 70)
 
         # --- Export final files ---
-        base = os.path.splitext(os.path.basename(temp_path))[0]
         srt_path = f"output/{base}.srt"
-        video_output_path = f"output/{base}_subtitled.mp4"
-        os.makedirs("output", exist_ok=True)
+        if audio_only:
+            video_output_path = f"output/{base}_subtitled.mp4" if st.session_state.audio_background else None
+        elif st.session_state.output_mode == "soft":
+            video_output_path = soft_subtitle_output_path(temp_path, f"output/{base}_subtitled")
+        elif st.session_state.output_mode == "preview":
+            video_output_path = f"output/{base}_preview.mp4"
+        else:
+            video_output_path = f"output/{base}_subtitled.mp4"
 
-        font_path = get_font_for_text(
-            translated_segments[0]['text'] if translated_segments else ''
-        )
-        os.makedirs("output", exist_ok=True)
+        # None lets the renderer pick a font per segment and script run
+        font_path = None
 
         export_srt(translated_segments, srt_path)
+        extra_outputs = []
+        if extra_segments and not audio_only:
+            for lang, segments in extra_segments.items():
+                code = st.session_state.LANG_DICT[lang]
+                extra_outputs.append((lang, f"output/{base}_{code}.srt", f"output/{base}_{code}_subtitled.mp4"))
+                export_srt(segments, extra_outputs[-1][1])
         progress_bar.progress(progress := 85)
 
-        render_subtitles_on_video(temp_path, translated_segments, video_output_path, font_path)
+        if extra_outputs:
+            # One decode feeds every language's encoder
+            render_languages(
+                temp_path,
+                {target_lang: translated_segments, **extra_segments},
+                {target_lang: video_output_path, **{lang: video for lang, _, video in extra_outputs}},
+                encoder_profile=st.session_state.encoder_profile,
+                media_info=media_info
+            )
+        else:
+            create_subtitled_video(
+                temp_path, translated_segments, srt_path, video_output_path, font_path,
+                output_mode=st.session_state.output_mode, subtitle_title=target_lang,
+                engine=st.session_state.render_engine, mode=st.session_state.render_mode,
+                preview_start=st.session_state.preview_start,
+                audio_background=st.session_state.audio_background,
+                encoder_profile=st.session_state.encoder_profile,
+                media_info=media_info
+            )
         progress_bar.progress(100)
 
         # Store results in session
         st.session_state.processing_done = True
         st.session_state.srt_file = srt_path
         st.session_state.video_file = video_output_path
+        st.session_state.extra_outputs = extra_outputs
         st.session_state.is_processing = False
 
-        # Update local history
-        with open(srt_path, "rb") as f1, open(video_output_path, "rb") as f2:
-            st.session_state.history.insert(0, {
-                "video_name": os.path.basename(video_output_path),
-                "srt_name": os.path.basename(srt_path),
-                "video_data": f2.read(),
-                "srt_data": f1.read()
-            })
-            st.session_state.history = st.session_state.history[:3]
+        # Keep what an edit needs to re-render only the changed parts
+        st.session_state.last_job = None
+        if st.session_state.output_mode == "burn" and not audio_only:
+            st.session_state.last_job = {
+                "source_path": temp_path,
+                "media_info": media_info,
+                "source_segments": source_segments,
+                "segments": translated_segments,
+                "target_code": st.session_state.LANG_DICT[target_lang],
+                "font_path": font_path,
+                "encoder_profile": st.session_state.encoder_profile,
+                "video": video_output_path,
+                "srt": srt_path
+            }
+
+        # Previews are throwaway checks; only full outputs go to history
+        if st.session_state.output_mode == "preview" and not audio_only:
+            return
+
+        # Soft subtitles are stream-copied, so no encoder profile applies
+        encoder_profile = None if video_output_path is None or (
+            st.session_state.output_mode == "soft" and not audio_only) else st.session_state.encoder_profile
 
-        # Save history in DB
-        save_to_gridfs(st.session_state.username, video_output_path, srt_path)
+        for _, extra_srt, extra_video in reversed(extra_outputs):
+            record_output(extra_video, extra_srt, encoder_profile)
+        record_output(video_output_path, srt_path, encoder_profile)
 
     except Exception as e:
         st.error(f"❌ Error: {str(e)}")
         st.exception(e)   # This prints the actual traceback
         st.session_state.is_processing = False
+    finally:
+        if leased_model:
+            model_pool.release(*leased_model)
 
 
 
@@ -573,9 +760,12 @@ def main_page():
             exp = st.expander("⬇️ View Recent Files")
             with exp:
                 for idx, item in enumerate(st.session_state.history):
-                    st.markdown(f"**🎮 {item['video_name']}**", unsafe_allow_html=True)
+                    st.markdown(f"**🎮 {item['video_name'] or item['srt_name']}**", unsafe_allow_html=True)
                     st.download_button("📄 Subtitle", item['srt_data'], file_name=item['srt_name'], key=f"srt_{idx}")
-                    st.download_button("🎮 Video", item['video_data'], file_name=item['video_name'], key=f"vid_{idx}")
+                    if item.get('encoder_profile'):
+                        st.caption(f"Encoded with `{item['encoder_profile']}` profile")
+                    if item['video_data']:
+                        st.download_button("🎮 Video", item['video_data'], file_name=item['video_name'], key=f"vid_{idx}")
         else:
             st.info("No recent files yet.")
 
@@ -606,6 +796,19 @@ def main_page():
     st.session_state.uploaded_file = st.file_uploader(
         "Choose a file", type=["mp4", "wav", "m4a"])
 
+    uploaded = st.session_state.uploaded_file
+    if uploaded and os.path.splitext(uploaded.name)[1].lower() in (".wav", ".m4a"):
+        audio_outputs = {
+            None: "📄 Subtitles only (SRT)",
+            "static": "🖼️ SRT + video on a plain background",
+            "waveform": "🌊 SRT + waveform video"
+        }
+        options = (None, *AUDIO_BACKGROUNDS)
+        st.session_state.audio_background = st.radio(
+            "Audio file output:", options,
+            index=options.index(st.session_state.audio_background),
+            format_func=audio_outputs.get)
+
     st.session_state.spoken_lang = st.selectbox(
         "🗣️ Spoken Language", ["Auto"] + list(st.session_state.LANG_DICT.keys())
     )
@@ -630,12 +833,79 @@ def main_page():
         f"<div style='padding:8px;background:#004225;color:#fff;border-radius:6px;'>"
         f"Selected: {selected_label} Mode {selected_emoji}"
         "</div>", unsafe_allow_html=True)
+    st.session_state.quantized = st.checkbox(
+        "⚡ INT8 quantized inference (faster on CPU, slightly less accurate)",
+        value=st.session_state.quantized,
+        disabled=st.session_state.device == "GPU (CUDA)")
+
+    transcribe_modes = {
+        "stream": "📝 Streaming (subtitles appear as they are transcribed)",
+        "parallel": "⚡ Parallel chunks (all CPU cores, needs a model copy per worker)"
+    }
+    st.session_state.transcribe_mode = st.radio(
+        "Transcription Mode:", list(transcribe_modes.keys()),
+        index=list(transcribe_modes.keys()).index(st.session_state.transcribe_mode),
+        format_func=transcribe_modes.get)
 
     # -------- Subtitle Language ----------
     st.markdown("### 🌐 Subtitle Language")
     st.session_state.target_lang = st.selectbox(
         "Subtitle Output Language:", list(st.session_state.LANG_DICT.keys()))
 
+    # -------- Output Type ----------
+    st.markdown("### 🎬 Output Type")
+    output_modes = {
+        "burn": "🔥 Burn-in (subtitles drawn on the video)",
+        "soft": "💬 Soft subtitles (selectable track, no re-encoding)",
+        "preview": "👀 Quick preview (20s low-resolution clip)"
+    }
+    st.session_state.output_mode = st.radio(
+        "Subtitle Delivery:", OUTPUT_MODES,
+        index=OUTPUT_MODES.index(st.session_state.output_mode),
+        format_func=output_modes.get)
+
+    if st.session_state.output_mode == "preview":
+        st.session_state.preview_start = st.number_input(
+            "Preview starts at (seconds):", min_value=0, step=5,
+            value=int(st.session_state.preview_start))
+
+    if st.session_state.output_mode == "burn":
+        st.session_state.extra_langs = st.multiselect(
+            "➕ Also burn in these languages (one decode for all):",
+            list(st.session_state.LANG_DICT.keys()),
+            default=st.session_state.extra_langs)
+
+        # Several languages are rendered by one fan-out pass (Python overlays, single decode)
+        multi_language = any(lang != st.session_state.target_lang for lang in st.session_state.extra_langs)
+
+        with st.expander("🛠️ Rendering Options"):
+            if multi_language:
+                st.caption("Extra languages are rendered together from one decode with Python overlays; "
+                           "engine and mode apply to single-language renders.")
+            engines = {"python": "🐍 Python overlays", "ffmpeg": "🎞️ ffmpeg (libass)"}
+            st.session_state.render_engine = st.selectbox(
+                "Render Engine:", RENDER_ENGINES,
+                index=RENDER_ENGINES.index(st.session_state.render_engine),
+                format_func=engines.get,
+                disabled=multi_language)
+            render_modes = {
+                "serial": "Single pass",
+                "threaded": "Threaded pipeline",
+                "parallel": "Parallel chunks (all CPU cores)",
+                "smart": "Smart (copy parts without subtitles)"
+            }
+            st.session_state.render_mode = st.selectbox(
+                "Render Mode (Python engine):", list(render_modes.keys()),
+                index=list(render_modes.keys()).index(st.session_state.render_mode),
+                format_func=render_modes.get,
+                disabled=multi_language or st.session_state.render_engine != "python")
+            profiles = list(ENCODER_PROFILES.keys())
+            st.session_state.encoder_profile = st.selectbox(
+                "Encoder Profile:", profiles,
+                index=profiles.index(st.session_state.encoder_profile),
+                format_func=lambda name: f"{name} ({ENCODER_PROFILES[name]['codec']}, "
+                                         f"{ENCODER_PROFILES[name]['preset']}, CRF {ENCODER_PROFILES[name]['crf']})")
+
     # -------- Start Processing ----------
     if st.button("▶️ Start Processing"):
         if not st.session_state.authenticated:
@@ -650,15 +920,44 @@ def main_page():
     # -------- Show Downloads after processing ----------
     if st.session_state.processing_done:
         st.success("🎉 Subtitles Ready!")
+        if st.session_state.video_file and st.session_state.video_file.endswith("_preview.mp4"):
+            st.video(st.session_state.video_file)
         col1, col2 = st.columns(2)
         with col1:
             with open(st.session_state.srt_file, "rb") as f:
                 st.download_button("📄 Download Subtitle", f,
                                    file_name=os.path.basename(st.session_state.srt_file))
-        with col2:
-            with open(st.session_state.video_file, "rb") as f:
-                st.download_button("🎮 Download Video", f,
-                                   file_name=os.path.basename(st.session_state.video_file))
+        if st.session_state.video_file:
+            with col2:
+                with open(st.session_state.video_file, "rb") as f:
+                    st.download_button("🎮 Download Video", f,
+                                       file_name=os.path.basename(st.session_state.video_file))
+        job = st.session_state.last_job
+        if job and job["video"] == st.session_state.video_file:
+            with st.expander("✏️ Edit Subtitles"):
+                rows = [{'start': tr['start'], 'end': tr['end'], 'original': src['text'], 'text': tr['text']}
+                        for src, tr in zip(job["source_segments"], job["segments"])]
+                edited = st.data_editor(rows, disabled=["start", "end"], key="subtitle_editor")
+                if st.button("💾 Apply Edits"):
+                    with st.spinner("Re-rendering changed parts..."):
+                        summary = apply_subtitle_edits(edited)
+                    if summary:
+                        st.success(f"Updated: re-encoded {summary['encoded_seconds']}s, "
+                                   f"kept {summary['copied_seconds']}s untouched.")
+                    else:
+                        st.success("Updated with a full re-render.")
+
+        for lang, extra_srt, extra_video in st.session_state.extra_outputs:
+            st.markdown(f"**🌐 {lang}**")
+            col1, col2 = st.columns(2)
+            with col1:
+                with open(extra_srt, "rb") as f:
+                    st.download_button("📄 Download Subtitle", f, file_name=os.path.basename(extra_srt),
+                                       key=f"extra_srt_{lang}")
+            with col2:
+                with open(extra_video, "rb") as f:
+                    st.download_button("🎮 Download Video", f, file_name=os.path.basename(extra_video),
+                                       key=f"extra_vid_{lang}")
 
 
 
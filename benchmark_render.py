@@ -0,0 +1,58 @@
+# benchmark_render.py
+# Compare the burn-in engines on one video:
+#   python benchmark_render.py input.mp4 [--srt subs.srt] [--font fonts/NotoSans-Regular.ttf]
+import argparse
+import os
+import tempfile
+import time
+
+import srt
+
+from subtitle_generator import render_subtitles_on_video, ENCODER_PROFILES, DEFAULT_ENCODER_PROFILE
+from media import probe_media
+
+CASES = [
+    ("python", "serial"),
+    ("python", "threaded"),
+    ("python", "parallel"),
+    ("python", "smart"),
+    ("ffmpeg", "serial"),
+]
+
+
+def load_segments(srt_path, duration):
+    if srt_path:
+        with open(srt_path, encoding="utf-8") as f:
+            return [{"start": sub.start.total_seconds(), "end": sub.end.total_seconds(), "text": sub.content}
+                    for sub in srt.parse(f.read())]
+    # Synthetic dialogue: a 3 second subtitle every 4 seconds.
+    return [{"start": t, "end": t + 3.0, "text": f"Benchmark subtitle number {i} with a few extra words"}
+            for i, t in enumerate(range(0, int(duration), 4))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark subtitle burn-in engines.")
+    parser.add_argument("video")
+    parser.add_argument("--srt", help="Subtitles to burn in (default: synthetic segments)")
+    parser.add_argument("--font", default="fonts/NotoSans-Regular.ttf")
+    parser.add_argument("--profile", default=DEFAULT_ENCODER_PROFILE, choices=sorted(ENCODER_PROFILES))
+    args = parser.parse_args()
+
+    info = probe_media(args.video)
+    segments = load_segments(args.srt, info.duration)
+    print(f"{args.video}: {info.width}x{info.height} @ {float(info.fps):.2f} fps, "
+          f"{info.frame_count} frames, {len(segments)} segments")
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        for engine, mode in CASES:
+            output_path = os.path.join(work_dir, f"{engine}_{mode}.mp4")
+            started = time.perf_counter()
+            render_subtitles_on_video(args.video, segments, output_path, args.font, engine=engine, mode=mode,
+                                      encoder_profile=args.profile, media_info=info)
+            elapsed = time.perf_counter() - started
+            size_mb = os.path.getsize(output_path) / 1e6
+            print(f"{engine:>6} / {mode:<8} {elapsed:8.2f}s  {info.frame_count / elapsed:8.1f} fps  {size_mb:8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# benchmark_whisper.py
+# Compare fp32 and INT8 dynamic-quantized Whisper on CPU over a fixed corpus:
+#   python benchmark_whisper.py corpus/ [--models tiny medium] [--language en]
+# The corpus directory holds audio files, each with a reference transcript in
+# a .txt file of the same name (e.g. talk01.wav + talk01.txt).
+import argparse
+import os
+import re
+import time
+
+import numpy as np
+
+from media import extract_pcm, PCM_SAMPLE_RATE
+from model_pool import load_whisper_model
+
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".m4a", ".flac", ".ogg", ".mp4")
+
+
+def load_corpus(corpus_dir):
+    corpus = []
+    for name in sorted(os.listdir(corpus_dir)):
+        base, ext = os.path.splitext(name)
+        reference_path = os.path.join(corpus_dir, base + ".txt")
+        if ext.lower() in AUDIO_EXTENSIONS and os.path.exists(reference_path):
+            with open(reference_path, encoding="utf-8") as f:
+                corpus.append((name, np.array(extract_pcm(os.path.join(corpus_dir, name))), f.read()))
+    return corpus
+
+
+def words(text):
+    return re.findall(r"\w+(?:'\w+)?", text.lower())
+
+
+def word_errors(reference, hypothesis):
+    """Word-level edit distance (substitutions + insertions + deletions)."""
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_word in enumerate(reference, start=1):
+        current = [i]
+        for j, hyp_word in enumerate(hypothesis, start=1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word)))
+        previous = current
+    return previous[-1]
+
+
+def run(model, corpus, language):
+    """Real-time factor and corpus WER of one model over the whole corpus."""
+    elapsed = audio_seconds = errors = reference_words = 0
+    for _, samples, reference in corpus:
+        started = time.perf_counter()
+        result = model.transcribe(samples, language=language, fp16=False)
+        elapsed += time.perf_counter() - started
+        audio_seconds += len(samples) / PCM_SAMPLE_RATE
+        reference = words(reference)
+        errors += word_errors(reference, words(result["text"]))
+        reference_words += len(reference)
+    return elapsed / max(audio_seconds, 1e-9), errors / max(reference_words, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark INT8 quantized Whisper against fp32 on CPU.")
+    parser.add_argument("corpus", help="Directory of audio files with same-named .txt references")
+    parser.add_argument("--models", nargs="+", default=["tiny", "medium"])
+    parser.add_argument("--language", help="Spoken language code (default: detect)")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    if not corpus:
+        parser.error(f"No audio files with .txt references found in {args.corpus}")
+    total_seconds = sum(len(samples) for _, samples, _ in corpus) / PCM_SAMPLE_RATE
+    print(f"{len(corpus)} files, {total_seconds:.0f}s of audio")
+    print(f"{'model':<8} {'fp32 RTF':>9} {'int8 RTF':>9} {'speedup':>8} {'fp32 WER':>9} {'int8 WER':>9} {'ΔWER':>7}")
+
+    for size in args.models:
+        fp32_rtf, fp32_wer = run(load_whisper_model(size, "cpu"), corpus, args.language)
+        int8_rtf, int8_wer = run(load_whisper_model(size, "cpu", quantized=True), corpus, args.language)
+        print(f"{size:<8} {fp32_rtf:9.3f} {int8_rtf:9.3f} {fp32_rtf / int8_rtf:7.2f}x "
+              f"{fp32_wer:9.2%} {int8_wer:9.2%} {int8_wer - fp32_wer:+7.2%}")
+
+
+if __name__ == "__main__":
+    main()
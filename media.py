@@ -0,0 +1,294 @@
+import os
+import json
+import time
+import hashlib
+import subprocess
+import threading
+import multiprocessing
+import concurrent.futures
+from dataclasses import dataclass
+from fractions import Fraction
+import numpy as np
+
+# Worker processes
+# Every process pool in the app uses spawn. The Streamlit server process has
+# torch loaded and its own and the model pool's threads running; a forked child
+# can inherit locks held by threads that do not exist in it and deadlock.
+# Spawned workers start from a clean interpreter and import what they need.
+WORKER_CONTEXT = multiprocessing.get_context("spawn")
+
+
+def worker_pool(max_workers, **kwargs):
+    """ProcessPoolExecutor using the app's one start method."""
+    return concurrent.futures.ProcessPoolExecutor(max_workers=max_workers, mp_context=WORKER_CONTEXT, **kwargs)
+
+
+# Per-asset media cache
+# Everything derived from a media file is stored under MEDIA_CACHE_DIR keyed by
+# the file's content hash, so a re-upload of the same bytes (under a new temp
+# name) reuses what earlier jobs already computed. Each kind of entry has its
+# own size budget; an entry's mtime is bumped whenever it is used and the least
+# recently used entries are deleted once a kind outgrows its budget.
+MEDIA_CACHE_DIR = os.getenv("MEDIA_CACHE_DIR", os.path.expanduser("~/.cache/subtitle_generator"))
+
+_hash_memo = {}
+_hash_lock = threading.Lock()
+
+
+def file_content_hash(path, chunk_size=1 << 20):
+    """SHA-256 of the file contents, memoised per (path, size, mtime) in this process."""
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _hash_lock:
+        if key in _hash_memo:
+            return _hash_memo[key]
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    content_hash = digest.hexdigest()
+    with _hash_lock:
+        _hash_memo[key] = content_hash
+    return content_hash
+
+
+def cache_path(kind, content_hash, ext):
+    directory = os.path.join(MEDIA_CACHE_DIR, kind)
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, content_hash + ext)
+
+
+def write_json_atomic(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def evict_lru(kind, ext, budget_mb, min_idle_seconds=0):
+    """Delete the least recently used `kind` entries until they fit budget_mb; returns how many.
+
+    Entries used within the last min_idle_seconds are kept even over budget.
+    """
+    directory = os.path.dirname(cache_path(kind, "", ""))
+    entries = []
+    for name in os.listdir(directory):
+        if name.endswith(ext):
+            try:
+                stat = os.stat(os.path.join(directory, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, os.path.join(directory, name)))
+
+    total = sum(size for _, size, _ in entries)
+    budget = budget_mb * 1024 * 1024
+    cutoff = time.time() - min_idle_seconds
+    removed = 0
+    for mtime, size, path in sorted(entries):
+        if total <= budget or mtime > cutoff:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    return removed
+
+
+# Keyframe / GOP index
+# One ffprobe packet scan (demux only, no decoding) records every keyframe's
+# time, byte offset and the number of frames in the GOP it opens. Chunked and
+# smart rendering, previews and incremental re-renders all read this index.
+# Every re-rendered output is new content with its own index, so the indexes
+# are kept within KEYFRAME_CACHE_MB.
+
+KEYFRAME_CACHE_MB = int(os.getenv("KEYFRAME_CACHE_MB", 64))
+
+
+def build_keyframe_index(path):
+    result = subprocess.run([
+        "ffprobe", "-v", "error", "-select_streams", "v:0",
+        "-show_entries", "packet=pts_time,pos,flags:format=start_time",
+        "-of", "json", path
+    ], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        # Never cache a failed scan: get_keyframe_index would serve it empty forever
+        raise ValueError(f"Could not index keyframes of {path}: {result.stderr.strip()}")
+    probe = json.loads(result.stdout or "{}")
+    offset = float(probe.get("format", {}).get("start_time") or 0)
+
+    keyframes = []
+    packets = probe.get("packets", [])
+    for pkt in packets:
+        if "K" in pkt.get("flags", "") and pkt.get("pts_time") not in (None, "N/A"):
+            keyframes.append({
+                "time": max(0.0, float(pkt["pts_time"]) - offset),
+                "pos": int(pkt["pos"]) if pkt.get("pos") not in (None, "N/A") else None,
+                "frames": 0,
+            })
+        if keyframes:
+            keyframes[-1]["frames"] += 1  # packets arrive in decode order, GOP by GOP
+    keyframes.sort(key=lambda k: k["time"])
+    return {"start_time": offset, "frame_count": len(packets), "keyframes": keyframes}
+
+
+def get_keyframe_index(path):
+    """Load the asset's keyframe index, building and persisting it on first use."""
+    index_path = cache_path("keyframes", file_content_hash(path), ".json")
+    try:
+        with open(index_path, encoding="utf-8") as f:
+            index = json.load(f)
+        os.utime(index_path)  # mark as recently used
+        return index
+    except (OSError, ValueError):
+        pass
+    index = build_keyframe_index(path)
+    write_json_atomic(index_path, index)
+    evict_lru("keyframes", ".json", KEYFRAME_CACHE_MB)
+    return index
+
+
+def keyframe_times(path):
+    """Keyframe times in seconds, relative to the start of the file."""
+    return [k["time"] for k in get_keyframe_index(path)["keyframes"]]
+
+
+# Media probe
+# A single ffprobe call reads container and stream metadata (no decoding), so
+# duration, frame rate, resolution and stream layout are known in milliseconds
+# even for hour-long uploads. Jobs probe once at ingest and hand the MediaInfo
+# to every later stage instead of re-opening the file.
+
+@dataclass(frozen=True)
+class MediaInfo:
+    path: str
+    duration: float
+    format_name: str = None
+    start_time: float = 0.0
+    bit_rate: int = 0
+    streams: tuple = ()  # (index, codec_type, codec_name) per stream
+    has_video: bool = False
+    has_audio: bool = False
+    width: int = 0
+    height: int = 0
+    fps: Fraction = Fraction(0)
+    frame_count: int = 0
+    codec: str = None
+    pix_fmt: str = None
+    time_base: str = None
+    audio_codec: str = None
+    sample_rate: int = 0
+    channels: int = 0
+
+    @property
+    def audio_only(self):
+        return not self.has_video
+
+
+_probe_memo = {}
+
+
+def probe_media(path):
+    """Container and stream metadata for path, memoised per (path, size, mtime)."""
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _hash_lock:
+        if key in _probe_memo:
+            return _probe_memo[key]
+
+    result = subprocess.run([
+        "ffprobe", "-v", "error",
+        "-show_entries",
+        "stream=index,codec_type,codec_name,pix_fmt,time_base,width,height,avg_frame_rate,r_frame_rate,"
+        "nb_frames,sample_rate,channels:stream_disposition=attached_pic"
+        ":format=duration,start_time,bit_rate,format_name",
+        "-of", "json", path
+    ], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    probe = json.loads(result.stdout or "{}")
+    if result.returncode != 0 or "format" not in probe:
+        raise ValueError(f"Could not read media file {path}: {result.stderr.strip()}")
+    fmt = probe["format"]
+    streams = probe.get("streams", [])
+    # Cover art shows up as a one-frame video stream; it does not make a file a video
+    video = next((st for st in streams if st.get("codec_type") == "video"
+                  and not st.get("disposition", {}).get("attached_pic")), None)
+    audio = next((st for st in streams if st.get("codec_type") == "audio"), None)
+
+    duration = float(fmt.get("duration") or 0)
+    details = {}
+    if video:
+        fps = Fraction(video.get("avg_frame_rate") or "0/1")
+        if fps <= 0:
+            fps = Fraction(video.get("r_frame_rate") or "25/1")
+        details.update(
+            width=int(video["width"]), height=int(video["height"]), fps=fps,
+            frame_count=int(video.get("nb_frames") or 0) or int(duration * fps),
+            codec=video.get("codec_name"), pix_fmt=video.get("pix_fmt"), time_base=video.get("time_base"))
+    if audio:
+        details.update(audio_codec=audio.get("codec_name"), sample_rate=int(audio.get("sample_rate") or 0),
+                       channels=int(audio.get("channels") or 0))
+
+    info = MediaInfo(
+        path=path, duration=duration, format_name=fmt.get("format_name"),
+        start_time=float(fmt.get("start_time") or 0), bit_rate=int(fmt.get("bit_rate") or 0),
+        streams=tuple((st.get("index"), st.get("codec_type"), st.get("codec_name")) for st in streams),
+        has_video=video is not None, has_audio=audio is not None, **details)
+    with _hash_lock:
+        _probe_memo[key] = info
+    return info
+
+
+# Shared PCM extraction
+# The audio track is decoded once per content hash to raw mono 16 kHz float32
+# (exactly what Whisper consumes) and memory-mapped read-only. Transcription,
+# silence detection, language detection and re-runs with another model all
+# slice the same mapping, so nothing decodes the file twice and long files
+# stay in the page cache instead of process memory. At about 230 MB per hour of
+# audio the files are kept within PCM_CACHE_MB; a file read in the last
+# PCM_IN_USE_SECONDS belongs to a running job and is never deleted under it.
+
+PCM_SAMPLE_RATE = 16000
+PCM_CACHE_MB = int(os.getenv("PCM_CACHE_MB", 2048))
+PCM_IN_USE_SECONDS = 600
+
+
+def extract_pcm(path):
+    """Mono 16 kHz float32 samples of path's audio as a read-only memmap."""
+    pcm_path = cache_path("pcm", file_content_hash(path), ".f32")
+    try:
+        os.utime(pcm_path)  # mark as recently used
+    except FileNotFoundError:
+        tmp_path = f"{pcm_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        result = subprocess.run([
+            "ffmpeg", "-nostdin", "-v", "error", "-y", "-i", path, "-vn",
+            "-ac", "1", "-ar", str(PCM_SAMPLE_RATE), "-acodec", "pcm_f32le", "-f", "f32le", tmp_path
+        ], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        if result.returncode != 0:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise RuntimeError(f"ffmpeg could not decode audio from {path}: {result.stderr.strip()}")
+        os.replace(tmp_path, pcm_path)
+        evict_lru("pcm", ".f32", PCM_CACHE_MB, PCM_IN_USE_SECONDS)
+    return open_pcm(pcm_path)
+
+
+def open_pcm(pcm_path):
+    """Map an extracted PCM file; worker processes use this with the parent's memmap filename."""
+    if os.path.getsize(pcm_path) == 0:
+        return np.zeros(0, np.float32)  # an empty file cannot be mapped
+    return np.memmap(pcm_path, dtype=np.float32, mode="r")
+
+
+def read_pcm(pcm_path, start, end):
+    """Samples [start, end) read with a plain file read.
+
+    Pages touched through a mapping stay resident (and count towards RSS)
+    until the kernel reclaims them, so jobs that walk a whole multi-hour file
+    read window by window instead and keep their footprint flat.
+    """
+    os.utime(pcm_path)  # reading is use: keeps a running job's file clear of eviction
+    with open(pcm_path, "rb") as f:
+        f.seek(start * 4)
+        return np.fromfile(f, dtype=np.float32, count=max(0, end - start))
@@ -0,0 +1,314 @@
+import os
+import gc
+import json
+import math
+import time
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import asdict
+import numpy as np
+import torch
+from torch import nn
+import torch.ao.nn.quantized.dynamic as nnqd
+import whisper
+from whisper.model import AudioEncoder, ModelDimensions, TextDecoder, Whisper
+
+# Whisper model pool
+# One registry per process holds every loaded model, shared by all Streamlit
+# sessions and jobs. Jobs acquire a model for as long as they use it; models
+# nobody holds are evicted least recently used first whenever loading another
+# one would exceed MODEL_POOL_MB. Sizes listed in WHISPER_PRELOAD are loaded
+# in the background at startup so the first job does not pay for them.
+# Model copies held outside the registry (parallel transcription workers) are
+# reserved against the same budget, so idle models make room for them too.
+
+WHISPER_CACHE_DIR = os.path.expanduser(os.getenv("WHISPER_CACHE_DIR", "~/.cache/whisper"))
+MODEL_POOL_MB = int(os.getenv("MODEL_POOL_MB", 8192))
+PRELOAD_MODELS = os.getenv("WHISPER_PRELOAD", "")
+PRELOAD_DEVICE = os.getenv("WHISPER_PRELOAD_DEVICE", "cpu")
+
+# fp32 weight sizes, used to make room before a model is loaded
+MODEL_WEIGHTS_MB = {"tiny": 150, "base": 290, "small": 970, "medium": 3060, "large": 6170, "turbo": 3240}
+
+
+def preload_sizes():
+    """Model sizes configured for warm preloading (WHISPER_PRELOAD, comma separated)."""
+    return [size.strip() for size in PRELOAD_MODELS.split(",") if size.strip()]
+
+
+def _estimated_mb(model_size, quantized=False):
+    mb = MODEL_WEIGHTS_MB.get(model_size.split("-")[0].split(".")[0], MODEL_WEIGHTS_MB["large"])
+    return mb // 3 if quantized else mb
+
+
+def _model_mb(model):
+    tensors = list(model.parameters()) + list(model.buffers())
+    total = sum(t.numel() * t.element_size() for t in tensors)
+    # Dynamic-quantized linears keep packed int8 weights outside parameters()
+    total += sum(m.weight().numel() for m in model.modules() if isinstance(m, nnqd.Linear))
+    return total / (1024 * 1024)
+
+
+# Memory-mapped weights
+# preload_model.py converts each checkpoint once into a raw fp32 .bin (every
+# tensor contiguous, 64-byte aligned) plus a JSON manifest of names, shapes and
+# offsets. Loading builds the model on the meta device and points its
+# parameters straight into a copy-on-write mapping of the .bin, so a cold
+# start does no deserialisation and every process using the same size shares
+# the read-only weight pages through the page cache.
+
+MMAP_MODEL_DIR = os.path.join(WHISPER_CACHE_DIR, "mmap")
+MMAP_FORMAT_VERSION = 1
+_ALIGNMENT = 16  # float32 elements, i.e. 64 bytes
+
+
+def _mmap_paths(model_size):
+    return (os.path.join(MMAP_MODEL_DIR, f"{model_size}.bin"),
+            os.path.join(MMAP_MODEL_DIR, f"{model_size}.json"))
+
+
+def convert_checkpoint(model_size):
+    """Write the memory-mappable .bin/.json pair for a model size; returns the manifest path."""
+    bin_path, manifest_path = _mmap_paths(model_size)
+    os.makedirs(MMAP_MODEL_DIR, exist_ok=True)
+    model = whisper.load_model(model_size, device="cpu", download_root=WHISPER_CACHE_DIR)
+
+    tensors = []
+    offset = 0
+    tmp_bin = f"{bin_path}.{os.getpid()}.tmp"
+    with open(tmp_bin, "wb") as f:
+        for name, tensor in model.state_dict().items():
+            data = tensor.detach().to(torch.float32).contiguous().numpy()
+            padding = -offset % _ALIGNMENT
+            f.write(b"\0" * (padding * 4))
+            offset += padding
+            f.write(data.tobytes())
+            tensors.append({"name": name, "shape": list(data.shape), "offset": offset})
+            offset += data.size
+    os.replace(tmp_bin, bin_path)
+
+    manifest = {
+        "version": MMAP_FORMAT_VERSION,
+        "dims": asdict(model.dims),
+        "numel": offset,
+        "tensors": tensors,
+        # Not part of the state dict (non-persistent buffer), so stored as [layer, head] pairs
+        "alignment_heads": model.alignment_heads.to_dense().nonzero().tolist(),
+    }
+    # The manifest is written last, so a half-written .bin is never picked up
+    tmp_manifest = f"{manifest_path}.{os.getpid()}.tmp"
+    with open(tmp_manifest, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_manifest, manifest_path)
+    return manifest_path
+
+
+def _meta_whisper(dims):
+    """An empty Whisper with every parameter on the meta device.
+
+    Whisper.__init__ cannot run there (its alignment-heads buffer is made with
+    to_sparse, which has no meta kernel), so the model is assembled from its
+    encoder and decoder; load_mmap_model adds the buffer afterwards.
+    """
+    model = Whisper.__new__(Whisper)
+    nn.Module.__init__(model)
+    model.dims = dims
+    with torch.device("meta"):
+        model.encoder = AudioEncoder(dims.n_mels, dims.n_audio_ctx, dims.n_audio_state, dims.n_audio_head,
+                                     dims.n_audio_layer)
+        model.decoder = TextDecoder(dims.n_vocab, dims.n_text_ctx, dims.n_text_state, dims.n_text_head,
+                                    dims.n_text_layer)
+    return model
+
+
+def load_mmap_model(model_size, device="cpu"):
+    """Load a converted model with its weights mapped from disk rather than read into memory."""
+    bin_path, manifest_path = _mmap_paths(model_size)
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    dims = ModelDimensions(**manifest["dims"])
+    model = _meta_whisper(dims)
+
+    # shared=False maps the file copy-on-write: pages are shared until written, and nothing is written
+    flat = torch.from_file(bin_path, shared=False, size=manifest["numel"], dtype=torch.float32)
+    state = {t["name"]: flat[t["offset"]:t["offset"] + math.prod(t["shape"])].view(t["shape"])
+             for t in manifest["tensors"]}
+    model.load_state_dict(state, assign=True)
+
+    # Non-persistent buffers are still on the meta device; rebuild them as Whisper's __init__ does
+    n_ctx = dims.n_text_ctx
+    model.decoder.register_buffer("mask", torch.empty(n_ctx, n_ctx).fill_(-np.inf).triu_(1), persistent=False)
+    heads = torch.zeros(dims.n_text_layer, dims.n_text_head, dtype=torch.bool)
+    for layer, head in manifest["alignment_heads"]:
+        heads[layer, head] = True
+    model.register_buffer("alignment_heads", heads.to_sparse(), persistent=False)
+    return model.to(device) if device != "cpu" else model
+
+
+def has_mmap_model(model_size):
+    bin_path, manifest_path = _mmap_paths(model_size)
+    if not (os.path.exists(bin_path) and os.path.exists(manifest_path)):
+        return False
+    try:
+        with open(manifest_path, encoding="utf-8") as f:
+            return json.load(f).get("version") == MMAP_FORMAT_VERSION
+    except (OSError, ValueError):
+        return False
+
+
+# INT8 dynamic quantization
+# On CPU-only nodes the Linear layers (attention projections and MLPs) dominate
+# Whisper's runtime. Dynamic quantization stores their weights as int8 and
+# quantizes activations on the fly, which is several times faster on CPU at a
+# small accuracy cost (see benchmark_whisper.py). Whisper wraps nn.Linear in a
+# subclass that quantize_dynamic does not match, so those layers are swapped
+# back to plain nn.Linear (sharing the same weights) first.
+
+def _plain_linears(module):
+    for name, child in module.named_children():
+        if isinstance(child, whisper.model.Linear):
+            linear = nn.Linear(child.in_features, child.out_features, bias=child.bias is not None, device="meta")
+            linear.weight = child.weight
+            linear.bias = child.bias
+            setattr(module, name, linear)
+        else:
+            _plain_linears(child)
+
+
+def quantize_model(model):
+    """Quantize the model's Linear layers to int8 in place; CPU only."""
+    _plain_linears(model)
+    # In place: a copy would read every memory-mapped weight into private memory
+    return torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+def load_whisper_model(model_size, device="cpu", quantized=False):
+    """Memory-mapped weights when the size has been converted, else the regular checkpoint."""
+    if quantized and device != "cpu":
+        raise ValueError("INT8 quantized Whisper models run on CPU only")
+    if has_mmap_model(model_size):
+        model = load_mmap_model(model_size, device)
+    else:
+        model = whisper.load_model(model_size, device=device, download_root=WHISPER_CACHE_DIR)
+    return quantize_model(model) if quantized else model
+
+
+class ModelPool:
+    """Process-wide Whisper models with reference counting and memory-aware LRU eviction."""
+
+    def __init__(self, budget_mb=MODEL_POOL_MB, loader=load_whisper_model):
+        self.budget_mb = budget_mb
+        self.loader = loader
+        # (size, device, quantized) -> {"model", "mb", "refs", "last_used"}, oldest first
+        self._entries = OrderedDict()
+        self._loading = {}  # same keys -> Event set once that load finishes
+        self._reserved = {}  # name -> MB held by models outside this registry
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.evictions = 0
+
+    def _used_mb(self):
+        return sum(entry["mb"] for entry in self._entries.values()) + sum(self._reserved.values())
+
+    def _evict_for(self, needed_mb):
+        """Drop idle models, least recently used first, until needed_mb fits. Caller holds the lock."""
+        for key in [key for key, entry in self._entries.items() if entry["refs"] == 0]:
+            if self._used_mb() + needed_mb <= self.budget_mb:
+                break
+            del self._entries[key]
+            self.evictions += 1
+
+    def acquire(self, model_size, device="cpu", quantized=False):
+        """Return the loaded model, loading it if needed; pair every call with release().
+
+        The int8 quantized variant of a size is a separate entry.
+        """
+        key = (model_size, device, quantized)
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry["refs"] += 1
+                    entry["last_used"] = time.time()
+                    self._entries.move_to_end(key)
+                    return entry["model"]
+                loading = self._loading.get(key)
+                if loading is None:
+                    self._loading[key] = threading.Event()
+                    self._evict_for(_estimated_mb(model_size, quantized))
+                    break
+            loading.wait()  # another job is loading this model; use its result
+
+        try:
+            model = self.loader(model_size, device, quantized)
+        except Exception:
+            with self._lock:
+                self._loading.pop(key).set()
+            raise
+        with self._lock:
+            self._entries[key] = {"model": model, "mb": _model_mb(model), "refs": 1, "last_used": time.time()}
+            self.loads += 1
+            self._evict_for(0)
+            self._loading.pop(key).set()
+        gc.collect()  # evicted models are only freed once nothing references them
+        return model
+
+    def release(self, model_size, device="cpu", quantized=False):
+        key = (model_size, device, quantized)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry["refs"] > 0:
+                entry["refs"] -= 1
+                entry["last_used"] = time.time()
+                self._entries.move_to_end(key)
+
+    @contextmanager
+    def model(self, model_size, device="cpu", quantized=False):
+        """Hold a model for the duration of a with-block."""
+        model = self.acquire(model_size, device, quantized)
+        try:
+            yield model
+        finally:
+            self.release(model_size, device, quantized)
+
+    def reserve(self, name, mb):
+        """Count mb held elsewhere (e.g. worker process copies) against the budget, evicting idle models."""
+        with self._lock:
+            self._reserved[name] = mb
+            self._evict_for(0)
+        gc.collect()
+
+    def unreserve(self, name):
+        with self._lock:
+            self._reserved.pop(name, None)
+
+    def preload(self, sizes, device="cpu"):
+        for size in sizes:
+            self.acquire(size, device)
+            self.release(size, device)
+
+    def stats(self):
+        with self._lock:
+            models = [{"model": size + (" (int8)" if quantized else ""), "device": device,
+                       "mb": round(entry["mb"]), "in_use": entry["refs"]}
+                      for (size, device, quantized), entry in self._entries.items()]
+            reserved = [{"name": name, "mb": round(mb)} for name, mb in self._reserved.items()]
+            return {"models": models, "reserved": reserved, "used_mb": round(self._used_mb()),
+                    "budget_mb": self.budget_mb, "loads": self.loads, "evictions": self.evictions}
+
+
+model_pool = ModelPool()
+_preload_started = False
+_preload_lock = threading.Lock()
+
+
+def start_preload(sizes=None, device=PRELOAD_DEVICE):
+    """Warm the pool with the configured sizes in a background thread, once per process."""
+    global _preload_started
+    sizes = preload_sizes() if sizes is None else sizes
+    with _preload_lock:
+        if _preload_started or not sizes:
+            return
+        _preload_started = True
+    threading.Thread(target=model_pool.preload, args=(sizes, device), daemon=True).start()
@@ -1,8 +1,14 @@
 # preload_model.py
-import whisper
-import os
+# Build step for the Whisper models the app is configured to warm-load
+# (WHISPER_PRELOAD, comma separated, e.g. "tiny,medium"): downloads each
+# checkpoint into the shared cache and converts it to the memory-mapped
+# layout that app and worker processes load from.
+from model_pool import preload_sizes, has_mmap_model, convert_checkpoint, MMAP_MODEL_DIR
 
-# Make sure it's cached in the same location
-os.environ["WHISPER_CACHE_DIR"] = os.path.expanduser("~/.cache/whisper")
-whisper.load_model("medium")  # Or 'tiny', 'large', etc.
-print("✅ Model preloaded and cached.")
+sizes = preload_sizes() or ["medium"]
+for size in sizes:
+    if has_mmap_model(size):
+        print(f"✅ Whisper '{size}' already converted in {MMAP_MODEL_DIR}.")
+        continue
+    convert_checkpoint(size)
+    print(f"✅ Whisper '{size}' downloaded and converted to {MMAP_MODEL_DIR}.")
@@ -2,16 +2,22 @@ import os                      # For interacting with the operating system (file
 import tempfile                # To create temporary files and directories safely
 import subprocess              # To run external commands (e.g., ffmpeg) as subprocesses
 import threading               # For running tasks concurrently in threads (background processing)
-import whisper                 # OpenAI Whisper speech-to-text model for transcription
+import queue                   # Bounded frame queues between pipeline stages
+import time                    # Stage timing for the threaded render pipeline
 import srt                     # For handling subtitle (.srt) files (parsing and generation)
 from datetime import timedelta # For handling time durations, useful for subtitle timestamps
-import cv2                     # OpenCV for video processing and manipulation
 import textwrap                # For wrapping and formatting text (subtitle line wrapping)
 import numpy as np             # Numerical operations, image array manipulation
+import cv2                     # OpenCV for resizing frames to each output rendition
 from PIL import ImageFont, ImageDraw, Image  # Pillow (PIL) for drawing text and fonts on images (subtitles rendering)
 import re                      # Regular expressions, for pattern matching (e.g., font selection based on Unicode)
+import functools               # LRU caches for resolved and loaded fonts
+from collections import OrderedDict  # Small LRU of rendered subtitle overlays
 from deep_translator import GoogleTranslator  # For translating text segments using Google Translate API
+from media import build_keyframe_index, get_keyframe_index, keyframe_times, probe_media, worker_pool  # Keyframe index, metadata probe, process pools
 import concurrent.futures      # For high-level concurrency, running translation or processing in parallel (threads or processes)
+import json                    # For parsing ffprobe output and render manifests
+import shutil                  # Moving spliced renders into place
 
 
 # Language setup
@@ -19,30 +25,81 @@ SUPPORTED_LANGS = GoogleTranslator().get_supported_languages(as_dict=True)
 LANG_DICT = {name.title(): code for name, code in SUPPORTED_LANGS.items()}
 
 # Font selection
+# Scripts are listed in priority order with the font each needs. A single
+# precompiled pattern finds every script run in one pass; fonts missing from
+# fonts/ fall back to NotoSans, and loaded FreeTypeFont objects are shared
+# process-wide through an LRU keyed by (path, size).
+
+FONT_DIR = "fonts"
+DEFAULT_FONT = f"{FONT_DIR}/NotoSans-Regular.ttf"
+
+SCRIPT_FONTS = [
+    ("arabic", "\u0600-\u06FF", "NotoSansArabic-Regular.ttf"),
+    ("hebrew", "\u0590-\u05FF", "NotoSansHebrew-Regular.ttf"),
+    ("japanese", "\u3040-\u30FF\u31F0-\u31FF", "NotoSansCJKjp-Regular.otf"),
+    ("korean", "\uAC00-\uD7AF", "NotoSansCJKkr-Regular.otf"),
+    ("chinese", "\u4E00-\u9FFF", "NotoSansSC-Regular.ttf"),
+    ("devanagari", "\u0900-\u097F", "NotoSansDevanagari-Regular.ttf"),
+    ("bengali", "\u0980-\u09FF", "NotoSansBengali-Regular.ttf"),
+    ("gurmukhi", "\u0A00-\u0A7F", "NotoSansGurmukhi-Regular.ttf"),
+    ("gujarati", "\u0A80-\u0AFF", "NotoSansGujarati-Regular.ttf"),
+    ("oriya", "\u0B00-\u0B7F", "NotoSansOriya-Regular.ttf"),
+    ("tamil", "\u0B80-\u0BFF", "NotoSansTamil-Regular.ttf"),
+    ("telugu", "\u0C00-\u0C7F", "NotoSansTelugu-Regular.ttf"),
+    ("kannada", "\u0C80-\u0CFF", "NotoSansKannada-Regular.ttf"),
+    ("malayalam", "\u0D00-\u0D7F", "NotoSansMalayalam-Regular.ttf"),
+    ("thai", "\u0E00-\u0E7F", "NotoSansThai-Regular.ttf"),
+    ("lao", "\u0E80-\u0EFF", "NotoSansLao-Regular.ttf"),
+    ("khmer", "\u1780-\u17FF", "NotoSansKhmer-Regular.ttf"),
+    ("myanmar", "\u1000-\u109F", "NotoSansMyanmar-Regular.ttf"),
+    ("ethiopic", "\u1200-\u137F", "NotoSansEthiopic-Regular.ttf"),
+    ("armenian", "\u0530-\u058F", "NotoSansArmenian-Regular.ttf"),
+    ("georgian", "\u10A0-\u10FF", "NotoSansGeorgian-Regular.ttf"),
+]
+_SCRIPT_PRIORITY = {name: i for i, (name, _, _) in enumerate(SCRIPT_FONTS)}
+_SCRIPT_FILES = {name: font_file for name, _, font_file in SCRIPT_FONTS}
+_SCRIPT_PATTERN = re.compile("|".join(f"(?P<{name}>[{ranges}]+)" for name, ranges, _ in SCRIPT_FONTS))
+
+
+@functools.lru_cache(maxsize=None)
+def _script_font(script):
+    path = f"{FONT_DIR}/{_SCRIPT_FILES[script]}"
+    return path if os.path.exists(path) else DEFAULT_FONT
+
+
+@functools.lru_cache(maxsize=64)
+def load_font(path, size):
+    return ImageFont.truetype(path, size)
+
+
 def get_font_for_text(text):
-   
-    if re.search(r'[\u0600-\u06FF]', text): return "fonts/NotoSansArabic-Regular.ttf"
-    elif re.search(r'[\u0590-\u05FF]', text): return "fonts/NotoSansHebrew-Regular.ttf"
-    elif re.search(r'[\u3040-\u30FF\u31F0-\u31FF]', text): return "fonts/NotoSansCJKjp-Regular.otf"
-    elif re.search(r'[\uAC00-\uD7AF]', text): return "fonts/NotoSansCJKkr-Regular.otf"
-    elif re.search(r'[\u4E00-\u9FFF]', text): return "fonts/NotoSansSC-Regular.ttf"
-    elif re.search(r'[\u0900-\u097F]', text): return "fonts/NotoSansDevanagari-Regular.ttf"
-    elif re.search(r'[\u0980-\u09FF]', text): return "fonts/NotoSansBengali-Regular.ttf"
-    elif re.search(r'[\u0A00-\u0A7F]', text): return "fonts/NotoSansGurmukhi-Regular.ttf"
-    elif re.search(r'[\u0A80-\u0AFF]', text): return "fonts/NotoSansGujarati-Regular.ttf"
-    elif re.search(r'[\u0B00-\u0B7F]', text): return "fonts/NotoSansOriya-Regular.ttf"
-    elif re.search(r'[\u0B80-\u0BFF]', text): return "fonts/NotoSansTamil-Regular.ttf"
-    elif re.search(r'[\u0C00-\u0C7F]', text): return "fonts/NotoSansTelugu-Regular.ttf"
-    elif re.search(r'[\u0C80-\u0CFF]', text): return "fonts/NotoSansKannada-Regular.ttf"
-    elif re.search(r'[\u0D00-\u0D7F]', text): return "fonts/NotoSansMalayalam-Regular.ttf"
-    elif re.search(r'[\u0E00-\u0E7F]', text): return "fonts/NotoSansThai-Regular.ttf"
-    elif re.search(r'[\u0E80-\u0EFF]', text): return "fonts/NotoSansLao-Regular.ttf"
-    elif re.search(r'[\u1780-\u17FF]', text): return "fonts/NotoSansKhmer-Regular.ttf"
-    elif re.search(r'[\u1000-\u109F]', text): return "fonts/NotoSansMyanmar-Regular.ttf"
-    elif re.search(r'[\u1200-\u137F]', text): return "fonts/NotoSansEthiopic-Regular.ttf"
-    elif re.search(r'[\u0530-\u058F]', text): return "fonts/NotoSansArmenian-Regular.ttf"
-    elif re.search(r'[\u10A0-\u10FF]', text): return "fonts/NotoSansGeorgian-Regular.ttf"
-    else: return "fonts/NotoSans-Regular.ttf"
+    """Font for the highest-priority script present in the text."""
+    scripts = {m.lastgroup for m in _SCRIPT_PATTERN.finditer(text)}
+    if not scripts:
+        return DEFAULT_FONT
+    return _script_font(min(scripts, key=_SCRIPT_PRIORITY.get))
+
+
+def font_runs(text):
+    """Split text into (run, font_path) pieces so mixed-script lines use a font per script."""
+    runs = []
+    pos = 0
+    for m in _SCRIPT_PATTERN.finditer(text):
+        if m.start() > pos:
+            runs.append([text[pos:m.start()], DEFAULT_FONT])
+        runs.append([m.group(), _script_font(m.lastgroup)])
+        pos = m.end()
+    if pos < len(text):
+        runs.append([text[pos:], DEFAULT_FONT])
+
+    # Spaces, digits and punctuation between scripts stay with the run before them.
+    merged = []
+    for run, path in runs:
+        if merged and (merged[-1][1] == path or not any(ch.isalpha() for ch in run)):
+            merged[-1][0] += run
+        else:
+            merged.append([run, path])
+    return [tuple(run) for run in merged]
 
 # Translation
 
@@ -71,77 +128,1181 @@ def export_srt(segments, srt_path):
     with open(srt_path, "w", encoding="utf-8") as f:
         f.write(srt.compose(subs))
 
+# Subtitle overlays
+# Each segment's wrapped, outlined text is rasterized once into a small bitmap
+# covering only its bounding box at the bottom of the frame; every frame the
+# segment is on screen just blends that box in with NumPy.
+
+SUBTITLE_PADDING = 30
+OUTLINE_OFFSETS = [(dx, dy) for dx in (-2, 2) for dy in (-2, 2)]
+
+
+def subtitle_font_size(width):
+    return max(24, width // 40)
+
+
+def wrap_subtitle_lines(text, width, font_size):
+    max_chars_per_line = max(20, width // (font_size // 2))
+    return textwrap.wrap(text, width=max_chars_per_line)[:2]  # Limit to 2 lines
+
+
+class SubtitleOverlay:
+    """Pre-rendered subtitle box: frame = frame * keep / 255 + add inside (x, y).
+
+    keep (the frame's remaining alpha) and add (the white fill) are uint8, so a
+    two-line 1080p box costs a few hundred KB instead of megabytes of float32.
+    """
+
+    def __init__(self, x, y, keep, add):
+        self.x = x
+        self.y = y
+        self.keep = keep
+        self.add = add
+
+    def apply(self, frame):
+        h, w = self.keep.shape[:2]
+        roi = frame[self.y:self.y + h, self.x:self.x + w]
+        blended = roi.astype(np.uint16) * self.keep
+        blended += 127  # round rather than truncate the integer division
+        blended //= 255
+        blended += self.add
+        np.minimum(blended, 255, out=blended)
+        roi[...] = blended
+        return frame
+
+    def scaled(self, scale_x, scale_y):
+        """The same box for a frame resized by (scale_x, scale_y)."""
+        h, w = self.keep.shape[:2]
+        x, y = int(round(self.x * scale_x)), int(round(self.y * scale_y))
+        size = (max(1, int(round((self.x + w) * scale_x)) - x), max(1, int(round((self.y + h) * scale_y)) - y))
+        keep = cv2.resize(self.keep, size, interpolation=cv2.INTER_AREA).reshape(size[1], size[0], 1)
+        add = cv2.resize(self.add, size, interpolation=cv2.INTER_AREA).reshape(size[1], size[0], 1)
+        return SubtitleOverlay(x, y, keep, add)
+
+
+def build_subtitle_overlay(text, width, height, font_size, font_path=None):
+    """font_path=None picks a font per script run of each line."""
+    lines = wrap_subtitle_lines(text, width, font_size)
+    if not lines:
+        return None
+
+    line_height = font_size + 8
+    y = height - SUBTITLE_PADDING - line_height * len(lines)
+    top = max(0, y - 2)
+
+    # Outline and fill are drawn as separate coverage masks so the result is
+    # identical to drawing black then white text straight onto the frame.
+    outline = Image.new("L", (width, height - top))
+    fill = Image.new("L", (width, height - top))
+    outline_draw = ImageDraw.Draw(outline)
+    fill_draw = ImageDraw.Draw(fill)
+    for line in lines:
+        runs = [(run, load_font(path, font_size)) for run, path in ([(line, font_path)] if font_path else font_runs(line))]
+        run_widths = [fill_draw.textlength(run, font=font) for run, font in runs]
+        x = (width - sum(run_widths)) // 2
+        for (run, font), run_width in zip(runs, run_widths):
+            for dx, dy in OUTLINE_OFFSETS:
+                outline_draw.text((x + dx, y - top + dy), run, font=font, fill=255)
+            fill_draw.text((x, y - top), run, font=font, fill=255)
+            x += run_width
+        y += line_height
+
+    outline = np.asarray(outline, dtype=np.float32) / 255.0
+    fill = np.asarray(fill, dtype=np.float32) / 255.0
+    rows = np.flatnonzero((outline > 0).any(axis=1) | (fill > 0).any(axis=1))
+    cols = np.flatnonzero((outline > 0).any(axis=0) | (fill > 0).any(axis=0))
+    if rows.size == 0:
+        return None
+
+    box = (slice(rows[0], rows[-1] + 1), slice(cols[0], cols[-1] + 1))
+    keep = np.rint((1.0 - outline[box]) * (1.0 - fill[box]) * 255.0).astype(np.uint8)[..., None]
+    add = np.rint(fill[box] * 255.0).astype(np.uint8)[..., None]
+    return SubtitleOverlay(int(cols[0]), top + int(rows[0]), keep, add)
+
+
+OVERLAY_CACHE_SIZE = 8
+
+
+class OverlayCache:
+    """Builds a subtitle text's overlay when it is first shown and keeps the last few.
+
+    Segments play in order and rarely repeat, so a small LRU covers the frames
+    of the current segment (and any brief back-and-forth) without holding every
+    overlay of a long video. font_path=None resolves fonts per segment (and
+    per script run) from fonts/. layout_size=(width, height) lays text out at
+    that frame size and scales the result down to width x height.
+    """
+
+    def __init__(self, font_path, width, height, max_entries=OVERLAY_CACHE_SIZE, layout_size=None):
+        self.font_path = font_path
+        self.width = width
+        self.height = height
+        self.layout_size = layout_size or (width, height)
+        self.font_size = subtitle_font_size(self.layout_size[0])
+        self.max_entries = max_entries
+        self._overlays = OrderedDict()
+
+    def get(self, text):
+        if text in self._overlays:
+            self._overlays.move_to_end(text)
+        else:
+            overlay = build_subtitle_overlay(text, *self.layout_size, self.font_size, self.font_path)
+            if overlay is not None and self.layout_size != (self.width, self.height):
+                overlay = overlay.scaled(self.width / self.layout_size[0], self.height / self.layout_size[1])
+            self._overlays[text] = overlay
+            if len(self._overlays) > self.max_entries:
+                self._overlays.popitem(last=False)
+        return self._overlays[text]
+
+
+# Subtitle timeline
+# Built once per job: segments sorted by start with each end clipped to the next
+# start, so any timestamp (or frame index at a given fps) maps to at most one
+# segment with a binary search, and whole frame ranges map in one vectorized call.
+
+class SubtitleTimeline:
+    def __init__(self, segments):
+        ordered = sorted(segments, key=lambda seg: seg["start"])
+        self.segments = ordered
+        self.texts = [seg["text"] for seg in ordered]
+        self.starts = np.array([seg["start"] for seg in ordered], dtype=np.float64)
+        ends = np.array([seg["end"] for seg in ordered], dtype=np.float64)
+        if len(ordered) > 1:
+            # Overlapping segments hand over to the later one when it starts.
+            ends[:-1] = np.minimum(ends[:-1], np.nextafter(self.starts[1:], -np.inf))
+        self.ends = ends
+
+    def __len__(self):
+        return len(self.segments)
+
+    def indices_at(self, times):
+        """Active segment index for each timestamp, -1 where no subtitle is shown."""
+        times = np.asarray(times, dtype=np.float64)
+        idx = np.searchsorted(self.starts, times, side="right") - 1
+        safe = np.clip(idx, 0, None)
+        active = (idx >= 0) & (times <= self.ends[safe]) if len(self) else np.zeros(times.shape, bool)
+        return np.where(active, idx, -1)
+
+    def index_at(self, t):
+        return int(self.indices_at(t))
+
+    def text_at(self, t):
+        idx = self.index_at(t)
+        return self.texts[idx] if idx >= 0 else ""
+
+    def frame_indices(self, fps, frame_count, start_time=0.0):
+        """Active segment index for `frame_count` frames starting at `start_time`."""
+        times = start_time + np.arange(max(0, frame_count), dtype=np.float64) / float(fps)
+        return self.indices_at(times)
+
+    def segments_between(self, start, end=None):
+        """Segments on screen at any point in [start, end)."""
+        lo = np.searchsorted(self.ends, start, side="left")
+        hi = len(self) if end is None else np.searchsorted(self.starts, end, side="left")
+        return self.segments[lo:max(lo, hi)]
+
+    def has_subtitle_between(self, start, end=None):
+        return len(self.segments_between(start, end)) > 0
+
+
+# ASS export
+# Same look as the Python overlays: the chosen font at subtitle_font_size(width)
+# em pixels, white fill with a 2px black outline, bottom-centred 30px above the
+# edge, wrapped by wrap_subtitle_lines and capped at two lines.
+
+ASS_HEADER = """[Script Info]
+ScriptType: v4.00+
+PlayResX: {width}
+PlayResY: {height}
+WrapStyle: 2
+ScaledBorderAndShadow: yes
+
+[V4+ Styles]
+Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, \
+Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, \
+MarginL, MarginR, MarginV, Encoding
+Style: Default,{font_name},{font_size},&H00FFFFFF,&H00FFFFFF,&H00000000,&H00000000,0,0,0,0,\
+100,100,0,0,1,2,0,2,10,10,{margin},1
+
+[Events]
+Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
+"""
+
+
+def _ass_time(seconds):
+    centis = int(round(max(0.0, seconds) * 100))
+    hours, centis = divmod(centis, 360000)
+    minutes, centis = divmod(centis, 6000)
+    secs, centis = divmod(centis, 100)
+    return f"{hours}:{minutes:02d}:{secs:02d}.{centis:02d}"
+
+
+def _ass_escape(line):
+    # A zero-width space keeps "\N", "\n" and "\h" in spoken text from becoming tags.
+    return line.replace("\\", "\\\u200b").replace("{", "\\{").replace("}", "\\}")
+
+
+def _ass_fonts_dir(font_path):
+    return os.path.dirname(font_path) if font_path else FONT_DIR
+
+
+def export_ass(segments, ass_path, font_path, width, height):
+    """font_path=None picks each segment's font with get_font_for_text."""
+    font_size = subtitle_font_size(width)
+    font = load_font(font_path or DEFAULT_FONT, font_size)
+    # libass sizes fonts by ascent + descent rather than by em, so convert.
+    ascent, descent = font.getmetrics()
+    style_font = font.getname()[0]
+    timeline = segments if isinstance(segments, SubtitleTimeline) else SubtitleTimeline(segments)
+
+    lines = [ASS_HEADER.format(width=width, height=height, font_name=style_font,
+                               font_size=ascent + descent, margin=SUBTITLE_PADDING)]
+    for text, start, end in zip(timeline.texts, timeline.starts, timeline.ends):
+        wrapped = wrap_subtitle_lines(text.strip(), width, font_size)
+        if wrapped and end > start:
+            body = "\\N".join(_ass_escape(line) for line in wrapped)
+            segment_font = load_font(font_path or get_font_for_text(text), font_size).getname()[0]
+            if segment_font != style_font:
+                body = f"{{\\fn{segment_font}}}" + body
+            lines.append(f"Dialogue: 0,{_ass_time(start)},{_ass_time(end)},Default,,0,0,0,,{body}\n")
+    with open(ass_path, "w", encoding="utf-8") as f:
+        f.write("".join(lines))
+
+
+# ffmpeg I/O
+# Frames travel as raw BGR24 through pipes: one ffmpeg process decodes the
+# source, another encodes the composited frames and muxes the original audio,
+# so there is no intermediate file and no second pass.
+
+FFMPEG_LOG_ARGS = ["-hide_banner", "-loglevel", "error"]
+
+# Encoder profiles
+# Named codec/preset/quality/thread settings for every rendered output; the
+# profile name is stored with the job so its outputs can be traced back to it.
+# threads=0 lets the encoder pick.
+
+ENCODER_PROFILES = {
+    "fast-preview": {"codec": "libx264", "preset": "ultrafast", "crf": 28, "threads": 0},
+    "balanced": {"codec": "libx264", "preset": "medium", "crf": 23, "threads": 0},
+    "archival": {"codec": "libx265", "preset": "slow", "crf": 20, "threads": 0},
+}
+DEFAULT_ENCODER_PROFILE = "balanced"
+
+
+def encoder_args(profile=DEFAULT_ENCODER_PROFILE, codec=None, threads=None, pix_fmt="yuv420p"):
+    """ffmpeg video output arguments for a named profile (codec/threads override it)."""
+    if profile not in ENCODER_PROFILES:
+        raise ValueError(f"Unknown encoder profile: {profile}")
+    settings = ENCODER_PROFILES[profile]
+    codec = codec or settings["codec"]
+    args = ["-c:v", codec, "-preset", settings["preset"]]
+    if settings.get("crf") is not None:
+        args += ["-crf", str(settings["crf"])]
+    if settings.get("bitrate"):
+        args += ["-b:v", settings["bitrate"]]
+    args += ["-pix_fmt", pix_fmt]
+    if codec == "libx265":
+        args += ["-tag:v", "hvc1"]  # lets Apple players recognise HEVC in MP4
+    threads = settings.get("threads", 0) if threads is None else threads
+    if threads:
+        args += ["-threads", str(threads)]
+    return args
+
+
+def _video_info(video_path, media_info=None):
+    """The caller's MediaInfo for video_path if it has one, else a fresh probe."""
+    info = media_info or probe_media(video_path)
+    if not info.has_video:
+        raise ValueError(f"No video stream found in {video_path}")
+    return info
+
+
+def _seek_args(start=None, duration=None):
+    args = ["-ss", f"{start:.6f}"] if start else []
+    return args + (["-t", f"{duration:.6f}"] if duration is not None else [])
+
+
+def _open_decoder(video_path, start=None, duration=None, video_filter=None, frames=None):
+    cmd = ["ffmpeg", *FFMPEG_LOG_ARGS, "-nostdin", *_seek_args(start, duration), "-i", video_path, "-map", "0:v:0"]
+    if video_filter:
+        cmd += ["-vf", video_filter]
+    if frames is not None:
+        # Counted decodes pass frames through as decoded; the default cfr mode would duplicate the
+        # first one when the seek lands half a frame before it, shifting the whole run by a frame
+        cmd += ["-fps_mode", "passthrough", "-frames:v", str(frames)]
+    cmd += ["-f", "rawvideo", "-pix_fmt", "bgr24", "-"]
+    return subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+
+def _open_encoder(output_path, width, height, fps, audio_source=None, video_args=None,
+                  audio_start=None, audio_duration=None, audio_args=("-c:a", "copy")):
+    cmd = [
+        "ffmpeg", "-y", *FFMPEG_LOG_ARGS,
+        "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{width}x{height}", "-r", str(fps), "-i", "-"
+    ]
+    if audio_source:
+        cmd += [*_seek_args(audio_start, audio_duration), "-i", audio_source,
+                "-map", "0:v:0", "-map", "1:a:0?", *audio_args]
+    cmd += [*(video_args or encoder_args()), output_path]
+    return subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+
+def _read_frame(stream, shape):
+    frame = np.empty(shape, dtype=np.uint8)
+    view = memoryview(frame).cast("B")
+    filled = 0
+    while filled < len(view):
+        n = stream.readinto(view[filled:])
+        if not n:
+            return None
+        filled += n
+    return frame
+
+
+def _close_decoder(proc):
+    proc.stdout.close()
+    proc.kill()
+    proc.wait()
+
+
+def _close_encoder(proc):
+    try:
+        proc.stdin.close()
+    except BrokenPipeError:
+        pass
+    stderr = proc.stderr.read()
+    proc.wait()
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg encoder failed: {stderr.decode(errors='ignore').strip()}")
+
+
+def _run_ffmpeg(cmd, total_frames=0, progress_callback=None):
+    """Run an ffmpeg command, reporting progress from its `-progress` frame counter."""
+    proc = subprocess.Popen(cmd[:1] + ["-progress", "pipe:1", "-nostats"] + cmd[1:],
+                            stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    errors = []
+    drain = threading.Thread(target=lambda: errors.append(proc.stderr.read()), daemon=True)
+    drain.start()
+    for line in proc.stdout:
+        if line.startswith("frame="):
+            _report_progress(progress_callback, int(line.split("=", 1)[1] or 0), total_frames)
+    proc.wait()
+    drain.join()
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {''.join(errors).strip()}")
+
+
+def _concat_and_mux(chunk_paths, audio_source, output_path, work_dir):
+    """Join identically encoded chunks losslessly and mux the source audio."""
+    list_path = os.path.join(work_dir, "chunks.txt")
+    with open(list_path, "w", encoding="utf-8") as f:
+        for path in chunk_paths:
+            f.write(f"file '{os.path.abspath(path)}'\n")
+    result = subprocess.run([
+        "ffmpeg", "-y", *FFMPEG_LOG_ARGS, "-f", "concat", "-safe", "0", "-i", list_path,
+        "-i", audio_source, "-map", "0:v:0", "-map", "1:a:0?", "-c", "copy", output_path
+    ], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg concat failed: {result.stderr.decode(errors='ignore').strip()}")
+
+
 # Subtitle rendering
 
-def render_subtitles_on_video(video_path, segments, output_path, font_path, progress_callback=None):
-    cap = cv2.VideoCapture(video_path)
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    temp_no_audio = tempfile.mktemp(suffix=".mp4")
-    out = cv2.VideoWriter(temp_no_audio, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
-
-    font_size = max(24, width // 40)
-    font = ImageFont.truetype(font_path, font_size)
-    padding = 30
+def _report_progress(progress_callback, done, total):
+    if progress_callback and total > 0:
+        progress_callback(80 + min(done / total, 1.0) * 15)
+
+
+def _frame_text(timeline, frame_map, frame_idx, fps, start_time=0.0):
+    if frame_idx < len(frame_map):
+        seg_idx = frame_map[frame_idx]
+    else:  # container frame count was short; fall back to a direct lookup
+        seg_idx = timeline.index_at(start_time + frame_idx / float(fps))
+    return timeline.texts[seg_idx] if seg_idx >= 0 else ""
+
+
+def _composite_stream(decoder, encoder, timeline, overlays, fps, start_time=0.0, expected_frames=0,
+                      on_frame=None):
+    """Overlay subtitles on every decoded frame and feed it to the encoder."""
+    shape = (overlays.height, overlays.width, 3)
+    frame_map = timeline.frame_indices(fps, expected_frames, start_time)
     frame_idx = 0
-    segment_index = 0
-    current_sub = ""
 
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
+    while True:
+        frame = _read_frame(decoder.stdout, shape)
+        if frame is None:
             break
-        current_time = frame_idx / fps
+        current_sub = _frame_text(timeline, frame_map, frame_idx, fps, start_time)
         frame_idx += 1
 
-        while segment_index < len(segments):
-            seg = segments[segment_index]
-            if seg["start"] <= current_time <= seg["end"]:
-                current_sub = seg["text"]
-                break
-            elif current_time > seg["end"]:
-                segment_index += 1
-                current_sub = ""
-            else:
+        if current_sub:
+            overlay = overlays.get(current_sub)
+            if overlay is not None:
+                overlay.apply(frame)
+        encoder.stdin.write(frame)
+
+        if on_frame:
+            on_frame(frame_idx)
+    return frame_idx
+
+
+def _render_serial(video_path, timeline, output_path, font_path, info, progress_callback, video_args):
+    overlays = OverlayCache(font_path, info.width, info.height)
+    decoder = _open_decoder(video_path)
+    encoder = _open_encoder(output_path, info.width, info.height, info.fps, audio_source=video_path,
+                            video_args=video_args)
+    try:
+        _composite_stream(
+            decoder, encoder, timeline, overlays, info.fps, expected_frames=info.frame_count,
+            on_frame=lambda n: _report_progress(progress_callback, n, info.frame_count))
+    except BrokenPipeError:
+        pass  # encoder exited early; _close_encoder reports why
+    finally:
+        _close_decoder(decoder)
+        _close_encoder(encoder)
+
+
+# Threaded rendering
+# Decode, overlay and encode run on their own threads joined by bounded queues,
+# so the decoder and encoder overlap while at most `queue_frames` frames wait
+# between any two stages. Time blocked on an empty or full queue counts as idle.
+
+_END_OF_STREAM = object()
+
+
+class StageStats:
+    def __init__(self, name):
+        self.name = name
+        self.busy = 0.0
+        self.idle = 0.0
+        self.frames = 0
+
+    def as_dict(self):
+        return {"busy": round(self.busy, 3), "idle": round(self.idle, 3), "frames": self.frames}
+
+
+def _queue_put(q, item, stats, stop):
+    started = time.perf_counter()
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            break
+        except queue.Full:
+            continue
+    stats.idle += time.perf_counter() - started
+
+
+def _queue_get(q, stats, stop):
+    started = time.perf_counter()
+    item = _END_OF_STREAM
+    while not stop.is_set():
+        try:
+            item = q.get(timeout=0.1)
+            break
+        except queue.Empty:
+            continue
+    stats.idle += time.perf_counter() - started
+    return item
+
+
+def _run_stages(bodies, stop, on_poll=None):
+    """Run each body on its own thread until all finish; the first failure stops the rest."""
+    errors = []
+
+    def run_stage(body):
+        try:
+            body()
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+
+    threads = [threading.Thread(target=run_stage, args=(body,), daemon=True) for body in bodies]
+    try:
+        for t in threads:
+            t.start()
+        # Polling happens on the calling thread so UI callbacks stay on it.
+        for t in threads:
+            while t.is_alive():
+                t.join(timeout=0.25)
+                if on_poll:
+                    on_poll()
+    finally:
+        stop.set()
+        for t in threads:
+            t.join()
+    return errors
+
+
+def _render_threaded(video_path, timeline, output_path, font_path, info, progress_callback, video_args,
+                     queue_frames):
+    overlays = OverlayCache(font_path, info.width, info.height)
+    shape = (info.height, info.width, 3)
+    fps = float(info.fps)
+    decoded = queue.Queue(maxsize=queue_frames)
+    composited = queue.Queue(maxsize=queue_frames)
+    stats = {name: StageStats(name) for name in ("decode", "overlay", "encode")}
+    stop = threading.Event()
+
+    decoder = _open_decoder(video_path)
+    encoder = _open_encoder(output_path, info.width, info.height, info.fps, audio_source=video_path,
+                            video_args=video_args)
+
+    def decode_stage():
+        st = stats["decode"]
+        try:
+            while not stop.is_set():
+                started = time.perf_counter()
+                frame = _read_frame(decoder.stdout, shape)
+                st.busy += time.perf_counter() - started
+                if frame is None:
+                    break
+                st.frames += 1
+                _queue_put(decoded, frame, st, stop)
+        finally:
+            _queue_put(decoded, _END_OF_STREAM, st, stop)
+
+    def overlay_stage():
+        st = stats["overlay"]
+        frame_map = timeline.frame_indices(fps, info.frame_count)
+        try:
+            while True:
+                frame = _queue_get(decoded, st, stop)
+                if frame is _END_OF_STREAM:
+                    break
+                started = time.perf_counter()
+                current_sub = _frame_text(timeline, frame_map, st.frames, fps)
+                if current_sub:
+                    overlay = overlays.get(current_sub)
+                    if overlay is not None:
+                        overlay.apply(frame)
+                st.busy += time.perf_counter() - started
+                st.frames += 1
+                _queue_put(composited, frame, st, stop)
+        finally:
+            _queue_put(composited, _END_OF_STREAM, st, stop)
+
+    def encode_stage():
+        st = stats["encode"]
+        while True:
+            frame = _queue_get(composited, st, stop)
+            if frame is _END_OF_STREAM:
                 break
+            started = time.perf_counter()
+            encoder.stdin.write(frame)
+            st.busy += time.perf_counter() - started
+            st.frames += 1
 
-        if current_sub:
-            frame_pil = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-            draw = ImageDraw.Draw(frame_pil)
+    try:
+        errors = _run_stages(
+            (decode_stage, overlay_stage, encode_stage), stop,
+            on_poll=lambda: _report_progress(progress_callback, stats["encode"].frames, info.frame_count))
+    finally:
+        _close_decoder(decoder)
+        _close_encoder(encoder)
 
-            max_chars_per_line = max(20, width // (font_size // 2))
-            wrapped_lines = textwrap.wrap(current_sub, width=max_chars_per_line)
-            wrapped_lines = wrapped_lines[:2]  # Limit to 2 lines
+    if errors and not isinstance(errors[0], BrokenPipeError):
+        raise errors[0]
+    return {name: st.as_dict() for name, st in stats.items()}
 
-            line_height = font_size + 8
-            y = height - padding - line_height * len(wrapped_lines)
 
-            for line in wrapped_lines:
-                text_width = draw.textlength(line, font=font)
-                x = (width - text_width) // 2
+# Parallel rendering
+# The input is split at keyframes so each worker process decodes only its own
+# time range, composites the segments overlapping it and encodes a video-only
+# chunk; the chunks are then concatenated with stream copy.
 
-                for dx in [-2, 2]:
-                    for dy in [-2, 2]:
-                        draw.text((x + dx, y + dy), line, font=font, fill=(0, 0, 0))
-                draw.text((x, y), line, font=font, fill=(255, 255, 255))
-                y += line_height
+def _chunk_ranges(keyframes, duration, chunk_count):
+    if not keyframes or keyframes[0] > 0:
+        keyframes = [0.0] + list(keyframes)
+    bounds = [0.0]
+    for i in range(1, chunk_count):
+        target = duration * i / chunk_count
+        nearest = min(keyframes, key=lambda k: abs(k - target))
+        if nearest > bounds[-1]:
+            bounds.append(nearest)
+    ends = bounds[1:] + [None]
+    return list(zip(bounds, ends))
 
-            frame = cv2.cvtColor(np.array(frame_pil), cv2.COLOR_RGB2BGR)
-        out.write(frame)
 
-        if progress_callback and frame_count > 0:
-            progress_callback(80 + (frame_idx / frame_count) * 15)
+def _expected_frames(info, start, end):
+    end = info.duration if end is None else end
+    return max(0, int(round((end - start) * info.fps)))
 
-    cap.release()
-    out.release()
-    cv2.destroyAllWindows()
 
-    subprocess.run([
-        "ffmpeg", "-y", "-i", temp_no_audio, "-i", video_path,
-        "-c:v", "copy", "-map", "0:v:0", "-map", "1:a:0", output_path
-    ], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+def _render_chunk(video_path, segments, chunk_path, font_path, width, height, fps, start, end,
+                  expected_frames=0, video_args=None, exact=False):
+    """Composite [start, end) into chunk_path.
+
+    exact: decode exactly expected_frames frames from the keyframe at start,
+    for parts that are spliced between stream-copied GOPs.
+    """
+    overlays = OverlayCache(font_path, width, height)
+    timeline = SubtitleTimeline(segments)
+    if exact:
+        # Seek half a frame early so the accurate seek cannot drop the keyframe itself.
+        decoder = _open_decoder(video_path, start=max(0.0, start - 0.5 / float(fps)), frames=expected_frames)
+    else:
+        decoder = _open_decoder(video_path, start=start, duration=None if end is None else end - start)
+    encoder = _open_encoder(chunk_path, width, height, fps, video_args=video_args)
+    try:
+        return _composite_stream(decoder, encoder, timeline, overlays, fps, start_time=start,
+                                 expected_frames=expected_frames)
+    except BrokenPipeError:
+        return 0
+    finally:
+        _close_decoder(decoder)
+        _close_encoder(encoder)
+
+
+def _render_parallel(video_path, timeline, output_path, font_path, info, progress_callback, profile, workers):
+    workers = workers or os.cpu_count() or 1
+    # Workers already occupy every core, so each chunk encoder gets its share.
+    video_args = encoder_args(profile, threads=max(1, (os.cpu_count() or 1) // workers))
+    ranges = _chunk_ranges(keyframe_times(video_path), info.duration, workers * 4)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        chunk_paths = [os.path.join(work_dir, f"chunk_{i:05d}.mp4") for i in range(len(ranges))]
+        frames_done = 0
+        with worker_pool(workers) as executor:
+            futures = []
+            for (start, end), chunk_path in zip(ranges, chunk_paths):
+                futures.append(executor.submit(
+                    _render_chunk, video_path, timeline.segments_between(start, end), chunk_path, font_path,
+                    info.width, info.height, info.fps, start, end, _expected_frames(info, start, end),
+                    video_args))
+            for future in concurrent.futures.as_completed(futures):
+                frames_done += future.result()
+                _report_progress(progress_callback, frames_done, info.frame_count)
+
+        _concat_and_mux(chunk_paths, video_path, output_path, work_dir)
+
+
+# Smart rendering
+# GOPs with no subtitle on screen are stream-copied untouched; only runs of GOPs
+# that need an overlay are decoded and re-encoded with the source codec and
+# pixel format. All parts are written as MPEG-TS so each keeps its own in-band
+# parameter sets, then spliced into the final MP4 with stream copy. Parts are
+# cut by frame count from the keyframe index, not by time: with B-frames a
+# time cut ends by decode timestamp and lets packets of the next GOP through.
+
+SMART_RENDER_ENCODERS = {"h264": "libx264", "hevc": "libx265"}
+ANNEXB_FILTERS = {"h264": "h264_mp4toannexb", "hevc": "hevc_mp4toannexb"}
+
+
+def _gop_runs(keyframes, duration, needs_encode):
+    """Merge consecutive GOPs into (start, end, needs_encode, frames) runs; end None = to EOF.
+
+    keyframes are keyframe index entries; frames is the run's total frame count.
+    """
+    gops = []
+    for k in keyframes:
+        if gops and (k["time"] <= gops[-1][0] or k["time"] >= duration):
+            gops[-1][1] += k["frames"]  # same timestamp or past the end: fold into the previous GOP
+        else:
+            gops.append([k["time"], k["frames"]])
+    if not gops:
+        return []
+    gops[0][0] = 0.0
+
+    runs = []
+    for (start, frames), end in zip(gops, [gop[0] for gop in gops[1:]] + [duration]):
+        encode = needs_encode(start, end)
+        if runs and runs[-1][2] == encode:
+            runs[-1][1] = end
+            runs[-1][3] += frames
+        else:
+            runs.append([start, end, encode, frames])
+    runs[-1][1] = None
+    return [tuple(run) for run in runs]
+
+
+def _copy_range(video_path, part_path, start, frames, codec, fps):
+    # Seek half a frame past the keyframe so rounding cannot land on the GOP before it.
+    seek = start + 0.5 / float(fps) if start > 0 else None
+    cmd = ["ffmpeg", "-y", *FFMPEG_LOG_ARGS, "-nostdin", *_seek_args(seek), "-i", video_path, "-map", "0:v:0",
+           "-frames:v", str(frames), "-c:v", "copy", "-bsf:v", ANNEXB_FILTERS[codec], "-f", "mpegts", part_path]
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg stream copy failed: {result.stderr.decode(errors='ignore').strip()}")
+    return frames
+
+
+def _splice_render(video_path, copy_source, timeline, output_path, font_path, info, runs, video_args, codec,
+                   progress_callback, workers):
+    """Re-encode runs flagged True from `video_path`, stream-copy the rest from `copy_source`."""
+    summary = {"copied_seconds": 0.0, "encoded_seconds": 0.0}
+    with tempfile.TemporaryDirectory() as work_dir:
+        part_paths = [os.path.join(work_dir, f"part_{i:05d}.ts") for i in range(len(runs))]
+        frames_done = 0
+        with worker_pool(workers or os.cpu_count() or 1) as executor:
+            futures = []
+            for (start, end, encode, frames), part_path in zip(runs, part_paths):
+                span = (info.duration if end is None else end) - start
+                if encode:
+                    summary["encoded_seconds"] += span
+                    futures.append(executor.submit(
+                        _render_chunk, video_path, timeline.segments_between(start, end), part_path, font_path,
+                        info.width, info.height, info.fps, start, end, frames, video_args, True))
+                else:
+                    summary["copied_seconds"] += span
+                    futures.append(executor.submit(_copy_range, copy_source, part_path, start, frames, codec,
+                                                   info.fps))
+            for future in concurrent.futures.as_completed(futures):
+                frames_done += future.result()
+                _report_progress(progress_callback, frames_done, info.frame_count)
+
+        # Write beside the target first: copy_source may be the file being replaced.
+        spliced_path = os.path.join(work_dir, "spliced" + os.path.splitext(output_path)[1])
+        _concat_and_mux(part_paths, video_path, spliced_path, work_dir)
+        expected = get_keyframe_index(video_path)["frame_count"]
+        spliced = build_keyframe_index(spliced_path)["frame_count"]
+        if spliced != expected:
+            raise RuntimeError(f"Spliced render has {spliced} frames, the source has {expected}")
+        shutil.move(spliced_path, output_path)
+    return {key: round(value, 3) for key, value in summary.items()}
 
+
+def _render_smart(video_path, timeline, output_path, font_path, info, progress_callback, profile, workers):
+    encoder = SMART_RENDER_ENCODERS.get(info.codec)
+    keyframes = get_keyframe_index(video_path)["keyframes"]
+    if encoder is None or len(keyframes) < 2:
+        # Unknown source codec or a single GOP: nothing can be copied safely.
+        _render_serial(video_path, timeline, output_path, font_path, info, progress_callback, encoder_args(profile))
+        return None
+
+    # Re-encoded parts must match the copied ones, so codec and pixel format
+    # follow the source; the profile only sets preset and quality.
+    video_args = encoder_args(profile, codec=encoder, pix_fmt=info.pix_fmt or "yuv420p") + ["-f", "mpegts"]
+    runs = _gop_runs(keyframes, info.duration, timeline.has_subtitle_between)
+    return _splice_render(video_path, video_path, timeline, output_path, font_path, info, runs, video_args,
+                          info.codec, progress_callback, workers)
+
+
+def render_subtitles_on_video(video_path, segments, output_path, font_path, progress_callback=None,
+                              mode="serial", workers=None, queue_frames=8, engine="python",
+                              encoder_profile=DEFAULT_ENCODER_PROFILE, media_info=None):
+    """Burn subtitles into a video. `segments` may be a list or a prebuilt SubtitleTimeline.
+
+    engine: "python" (cached NumPy overlays, uses `mode`) or "ffmpeg" (libass
+    burn-in inside a single ffmpeg process; `mode` is ignored).
+    encoder_profile: a key of ENCODER_PROFILES.
+    mode: "serial", "threaded" (decode/overlay/encode threads, returns per-stage
+    busy/idle stats), "parallel" (one worker process per keyframe chunk) or
+    "smart" (stream-copies GOPs without subtitles, returns copied/encoded seconds).
+    media_info: the job's MediaInfo for video_path, if already probed.
+    """
+    if engine not in RENDER_ENGINES:
+        raise ValueError(f"Unknown render engine: {engine}")
+    info = _video_info(video_path, media_info)
+    timeline = segments if isinstance(segments, SubtitleTimeline) else SubtitleTimeline(segments)
+    video_args = encoder_args(encoder_profile)
+    stats = None
+    if engine == "ffmpeg":
+        _render_libass(video_path, timeline, output_path, font_path, info, progress_callback, video_args)
+    elif mode == "parallel":
+        _render_parallel(video_path, timeline, output_path, font_path, info, progress_callback, encoder_profile,
+                         workers)
+    elif mode == "smart":
+        stats = _render_smart(video_path, timeline, output_path, font_path, info, progress_callback, encoder_profile,
+                              workers)
+    elif mode == "threaded":
+        stats = _render_threaded(video_path, timeline, output_path, font_path, info, progress_callback, video_args,
+                                 queue_frames)
+    else:
+        _render_serial(video_path, timeline, output_path, font_path, info, progress_callback, video_args)
+
+    write_render_manifest(output_path, video_path, timeline, font_path, encoder_profile, engine)
+    if progress_callback:
+        progress_callback(100)
+    return stats
+
+
+# Incremental re-render
+# Every burn-in leaves a manifest next to its output recording the segments it
+# was rendered with. After an edit, the old and new timelines are compared frame
+# by frame; only the output GOPs whose on-screen text changed are re-encoded
+# from the source and spliced between stream-copied GOPs of the existing output.
+
+def _manifest_path(output_path):
+    return output_path + ".render.json"
+
+
+def write_render_manifest(output_path, video_path, timeline, font_path, encoder_profile, engine="python"):
+    manifest = {
+        "source": os.path.abspath(video_path),
+        "font_path": font_path,
+        "encoder_profile": encoder_profile,
+        "engine": engine,
+        "segments": [{"start": float(seg["start"]), "end": float(seg["end"]), "text": seg["text"]}
+                     for seg in timeline.segments],
+    }
+    with open(_manifest_path(output_path), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+
+
+def load_render_manifest(output_path):
+    try:
+        with open(_manifest_path(output_path), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def changed_frame_mask(old_timeline, new_timeline, fps, frame_count):
+    """Boolean per frame: True where the subtitle text on screen differs."""
+    old_texts = np.array(old_timeline.texts + [""], dtype=object)
+    new_texts = np.array(new_timeline.texts + [""], dtype=object)
+    # Index -1 (no subtitle) picks the trailing "" in both arrays.
+    old_on_screen = old_texts[old_timeline.frame_indices(fps, frame_count)]
+    new_on_screen = new_texts[new_timeline.frame_indices(fps, frame_count)]
+    return old_on_screen != new_on_screen
+
+
+def rerender_after_edit(video_path, output_path, new_segments, font_path=None, progress_callback=None,
+                        workers=None, media_info=None):
+    """Update a burned-in output after subtitle edits, re-encoding only the changed GOPs.
+
+    Falls back to a full render when the output has no manifest, was drawn by
+    another engine or font, or its codec cannot be matched. Returns
+    copied/encoded seconds.
+    """
+    manifest = load_render_manifest(output_path) or {}
+    new_timeline = SubtitleTimeline(new_segments)
+    profile = manifest.get("encoder_profile") or DEFAULT_ENCODER_PROFILE
+    engine = manifest.get("engine", "python")
+    font_path = font_path if font_path is not None else manifest.get("font_path")
+
+    info = _video_info(video_path, media_info)
+    output_info = _video_info(output_path) if manifest and os.path.exists(output_path) else None
+    if output_info and (output_info.width, output_info.height) != (info.width, info.height):
+        # A downscaled rendition: redraw it at its own size from one decode.
+        render_targets(video_path, [RenderTarget(output_path, new_timeline, font_path, output_info.height)],
+                       progress_callback, profile, media_info=info)
+        return None
+
+    encoder = SMART_RENDER_ENCODERS.get(output_info.codec) if output_info else None
+    keyframes = get_keyframe_index(output_path)["keyframes"] if encoder else []
+    if encoder is None or len(keyframes) < 2 or engine != "python" or font_path != manifest.get("font_path"):
+        render_subtitles_on_video(video_path, new_timeline, output_path, font_path, progress_callback,
+                                  engine=engine, encoder_profile=profile, media_info=info)
+        return None
+
+    fps = float(info.fps)
+    changed = changed_frame_mask(SubtitleTimeline(manifest["segments"]), new_timeline, fps, info.frame_count)
+    changed_frames = np.flatnonzero(changed)
+    summary = {"copied_seconds": round(info.duration, 3), "encoded_seconds": 0.0}
+
+    if changed_frames.size:
+        def gop_changed(start, end):
+            lo, hi = np.searchsorted(changed_frames, [start * fps - 1e-6, end * fps - 1e-6])
+            return bool(hi > lo)
+
+        runs = _gop_runs(keyframes, info.duration, gop_changed)
+        video_args = encoder_args(profile, codec=encoder, pix_fmt=output_info.pix_fmt or "yuv420p") + \
+            ["-f", "mpegts"]
+        summary = _splice_render(video_path, output_path, new_timeline, output_path, font_path, info, runs,
+                                 video_args, output_info.codec, progress_callback, workers)
+
+    write_render_manifest(output_path, video_path, new_timeline, font_path, profile)
     if progress_callback:
         progress_callback(100)
+    return summary
+
+
+def retranslate_edited_segments(old_source, new_source, old_translated, target_lang):
+    """Translate only the source segments that changed; reuse every other translation."""
+    previous = {(round(src["start"], 3), round(src["end"], 3), src["text"]): tr["text"]
+                for src, tr in zip(old_source, old_translated)}
+    results = [None] * len(new_source)
+    pending = []
+    for i, seg in enumerate(new_source):
+        key = (round(seg["start"], 3), round(seg["end"], 3), seg["text"])
+        if key in previous:
+            results[i] = {"start": seg["start"], "end": seg["end"], "text": previous[key]}
+        else:
+            pending.append(i)
+    with concurrent.futures.ThreadPoolExecutor() as executor:
+        for i, translated in zip(pending, executor.map(
+                lambda i: translate_segment_parallel(new_source[i], target_lang), pending)):
+            results[i] = translated
+    return results
+
+
+# Multi-output rendering
+# The source is decoded once and every frame is fanned out to several targets.
+# Each target thread resizes the frame to its own resolution, composites its own
+# subtitles (overlays are built at that resolution, so text stays crisp) and
+# feeds its own ffmpeg encoder, so all encodes run in parallel from one decode.
+
+class RenderTarget:
+    """One output of a fan-out render; height=None keeps the source resolution."""
+
+    def __init__(self, output_path, segments, font_path, height=None):
+        self.output_path = output_path
+        self.timeline = segments if isinstance(segments, SubtitleTimeline) else SubtitleTimeline(segments)
+        self.font_path = font_path
+        self.height = height
+
+
+def render_targets(video_path, targets, progress_callback=None, encoder_profile=DEFAULT_ENCODER_PROFILE,
+                   queue_frames=8, media_info=None):
+    """Render every RenderTarget from a single decode; returns per-stage busy/idle stats."""
+    info = _video_info(video_path, media_info)
+    fps = float(info.fps)
+    source_shape = (info.height, info.width, 3)
+    video_args = encoder_args(encoder_profile)
+    stop = threading.Event()
+    decode_stats = StageStats("decode")
+    target_stats = [StageStats(target.output_path) for target in targets]
+    frame_queues = [queue.Queue(maxsize=queue_frames) for _ in targets]
+    sizes = [_scaled_size(info.width, info.height, target.height or info.height) for target in targets]
+
+    decoder = _open_decoder(video_path)
+    encoders = []
+    try:
+        for target, (width, height) in zip(targets, sizes):
+            encoders.append(_open_encoder(target.output_path, width, height, info.fps,
+                                          audio_source=video_path, video_args=video_args))
+
+        def decode_stage():
+            try:
+                while not stop.is_set():
+                    started = time.perf_counter()
+                    frame = _read_frame(decoder.stdout, source_shape)
+                    decode_stats.busy += time.perf_counter() - started
+                    if frame is None:
+                        break
+                    decode_stats.frames += 1
+                    for q in frame_queues:
+                        _queue_put(q, frame, decode_stats, stop)
+            finally:
+                for q in frame_queues:
+                    _queue_put(q, _END_OF_STREAM, decode_stats, stop)
+
+        def target_stage(i):
+            target, st, (width, height) = targets[i], target_stats[i], sizes[i]
+            overlays = OverlayCache(target.font_path, width, height)
+            frame_map = target.timeline.frame_indices(fps, info.frame_count)
+            while True:
+                frame = _queue_get(frame_queues[i], st, stop)
+                if frame is _END_OF_STREAM:
+                    break
+                started = time.perf_counter()
+                current_sub = _frame_text(target.timeline, frame_map, st.frames, fps)
+                overlay = overlays.get(current_sub) if current_sub else None
+                if (height, width) != frame.shape[:2]:
+                    frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+                elif overlay is not None:
+                    frame = frame.copy()  # the decoded frame is shared with the other targets
+                if overlay is not None:
+                    overlay.apply(frame)
+                encoders[i].stdin.write(frame)
+                st.busy += time.perf_counter() - started
+                st.frames += 1
+
+        stages = [decode_stage] + [lambda i=i: target_stage(i) for i in range(len(targets))]
+        errors = _run_stages(stages, stop, on_poll=lambda: _report_progress(
+            progress_callback, min((st.frames for st in target_stats), default=0), info.frame_count))
+    finally:
+        _close_decoder(decoder)
+        for encoder in encoders:
+            _close_encoder(encoder)
+
+    if errors and not isinstance(errors[0], BrokenPipeError):
+        raise errors[0]
+    for target in targets:
+        write_render_manifest(target.output_path, video_path, target.timeline, target.font_path, encoder_profile)
+    if progress_callback:
+        progress_callback(100)
+    return {"decode": decode_stats.as_dict(), **{st.name: st.as_dict() for st in target_stats}}
+
+
+def render_renditions(video_path, segments, outputs, font_path, progress_callback=None,
+                      encoder_profile=DEFAULT_ENCODER_PROFILE, media_info=None):
+    """Burn the same subtitles into several resolutions, e.g. {1080: "a.mp4", 720: "b.mp4"}."""
+    timeline = segments if isinstance(segments, SubtitleTimeline) else SubtitleTimeline(segments)
+    targets = [RenderTarget(path, timeline, font_path, height=height) for height, path in outputs.items()]
+    return render_targets(video_path, targets, progress_callback, encoder_profile, media_info=media_info)
+
+
+def render_languages(video_path, segments_by_language, outputs, progress_callback=None,
+                     encoder_profile=DEFAULT_ENCODER_PROFILE, font_paths=None, media_info=None):
+    """Burn one output per language from a single decode.
+
+    segments_by_language and outputs are keyed by language; each language's
+    segments get fonts from get_font_for_text/font_runs unless font_paths
+    pins one for that language.
+    """
+    font_paths = font_paths or {}
+    targets = [RenderTarget(outputs[language], segments, font_paths.get(language))
+               for language, segments in segments_by_language.items()]
+    return render_targets(video_path, targets, progress_callback, encoder_profile, media_info=media_info)
+
+
+# Preview rendering
+# A short, downscaled window rendered with the same overlay code as the full
+# burn-in and a fast encoder preset, so users can check placement and
+# translation before paying for a full render. Overlays are laid out at the
+# source size and scaled down with the frame, so font size and line wrapping
+# are exactly those of the full render.
+
+def _scaled_size(width, height, target_height):
+    """Even-sized (width, height) at `target_height` lines, never upscaling."""
+    target_height = min(height, target_height)
+    target_width = int(round(width * target_height / height / 2)) * 2
+    return target_width, target_height - target_height % 2
+
+
+def render_preview(video_path, segments, output_path, font_path, start=0.0, duration=20.0,
+                   preview_height=360, progress_callback=None, media_info=None):
+    info = _video_info(video_path, media_info)
+    timeline = segments if isinstance(segments, SubtitleTimeline) else SubtitleTimeline(segments)
+    start = max(0.0, min(start, max(0.0, info.duration - duration)))
+    width, height = _scaled_size(info.width, info.height, preview_height)
+
+    overlays = OverlayCache(font_path, width, height, layout_size=(info.width, info.height))
+    window = SubtitleTimeline(timeline.segments_between(start, start + duration))
+    decoder = _open_decoder(video_path, start=start, duration=duration, video_filter=f"scale={width}:{height}")
+    encoder = _open_encoder(output_path, width, height, info.fps, audio_source=video_path,
+                            video_args=encoder_args("fast-preview"), audio_start=start, audio_duration=duration,
+                            audio_args=("-c:a", "aac", "-b:a", "96k"))
+    expected = int(round(duration * info.fps))
+    try:
+        _composite_stream(decoder, encoder, window, overlays, info.fps, start_time=start,
+                          expected_frames=expected,
+                          on_frame=lambda n: _report_progress(progress_callback, n, expected))
+    except BrokenPipeError:
+        pass  # encoder exited early; _close_encoder reports why
+    finally:
+        _close_decoder(decoder)
+        _close_encoder(encoder)
+
+    if progress_callback:
+        progress_callback(100)
+
+
+# libass rendering
+# Alternative engine: the segments are converted to an ASS script and burned in
+# by ffmpeg's ass filter inside the encoder process, so no frame ever passes
+# through Python.
+
+RENDER_ENGINES = ("python", "ffmpeg")
+
+
+def _filter_path(path):
+    return os.path.abspath(path).replace("\\", "/").replace(":", "\\:").replace("'", "\\'")
+
+
+def _render_libass(video_path, timeline, output_path, font_path, info, progress_callback, video_args):
+    with tempfile.TemporaryDirectory() as work_dir:
+        ass_path = os.path.join(work_dir, "subtitles.ass")
+        export_ass(timeline, ass_path, font_path, info.width, info.height)
+        video_filter = f"ass=filename='{_filter_path(ass_path)}':fontsdir='{_filter_path(_ass_fonts_dir(font_path))}'"
+        _run_ffmpeg([
+            "ffmpeg", "-y", *FFMPEG_LOG_ARGS, "-i", video_path, "-vf", video_filter,
+            "-map", "0:v:0", "-map", "0:a:0?", "-c:a", "copy", *video_args, output_path
+        ], info.frame_count, progress_callback)
+
+
+# Audio-only rendering
+# wav/m4a uploads have no frames to draw on. When a video is wanted anyway, the
+# background (flat colour or waveform) is generated by ffmpeg and the subtitles
+# are burned in with libass in the same process.
+
+AUDIO_VIDEO_SIZE = (1280, 720)
+AUDIO_VIDEO_FPS = 25
+AUDIO_BACKGROUNDS = ("static", "waveform")
+
+
+def render_audio_video(audio_path, segments, output_path, font_path, background="static", progress_callback=None,
+                       encoder_profile=DEFAULT_ENCODER_PROFILE, media_info=None):
+    if background not in AUDIO_BACKGROUNDS:
+        raise ValueError(f"Unknown audio background: {background}")
+    width, height = AUDIO_VIDEO_SIZE
+    duration = (media_info or probe_media(audio_path)).duration
+    with tempfile.TemporaryDirectory() as work_dir:
+        ass_path = os.path.join(work_dir, "subtitles.ass")
+        export_ass(segments, ass_path, font_path, width, height)
+        subtitles = f"ass=filename='{_filter_path(ass_path)}':fontsdir='{_filter_path(_ass_fonts_dir(font_path))}'"
+        if background == "waveform":
+            # showwaves' own rate only sets samples per column (34.45 fps at 44.1 kHz), so resample
+            graph = (f"[0:a]showwaves=s={width}x{height}:mode=cline:rate={AUDIO_VIDEO_FPS}:colors=0x3a7bd5,"
+                     f"fps={AUDIO_VIDEO_FPS},format=yuv420p,{subtitles}[v]")
+            inputs = ["-i", audio_path]
+        else:
+            graph = f"[1:v]{subtitles}[v]"
+            inputs = ["-i", audio_path, "-f", "lavfi",
+                      "-i", f"color=c=0x101820:s={width}x{height}:r={AUDIO_VIDEO_FPS}"]
+        _run_ffmpeg([
+            "ffmpeg", "-y", *FFMPEG_LOG_ARGS, *inputs, "-filter_complex", graph,
+            "-map", "[v]", "-map", "0:a:0", "-c:a", "aac", "-shortest", *encoder_args(encoder_profile), output_path
+        ], int(duration * AUDIO_VIDEO_FPS), progress_callback)
+
+
+# Soft subtitles
+# The SRT is muxed as a player-selectable track into the original container
+# with stream copy, so delivery is bound by I/O rather than frame processing.
+
+SOFT_SUBTITLE_CODECS = {".mp4": "mov_text", ".m4v": "mov_text", ".mov": "mov_text",
+                        ".mkv": "webvtt", ".webm": "webvtt"}
+
+
+def soft_subtitle_output_path(video_path, output_base):
+    ext = os.path.splitext(video_path)[1].lower()
+    return output_base + (ext if ext in SOFT_SUBTITLE_CODECS else ".mp4")
+
+
+def mux_soft_subtitles(video_path, srt_path, output_path, title=None):
+    codec = SOFT_SUBTITLE_CODECS.get(os.path.splitext(output_path)[1].lower(), "mov_text")
+    cmd = [
+        "ffmpeg", "-y", *FFMPEG_LOG_ARGS, "-nostdin", "-i", video_path, "-i", srt_path,
+        "-map", "0:v?", "-map", "0:a?", "-map", "1:0", "-c", "copy", "-c:s", codec,
+        "-disposition:s:0", "default"
+    ]
+    if title:
+        cmd += ["-metadata:s:s:0", f"title={title}"]
+    cmd.append(output_path)
+    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg subtitle mux failed: {result.stderr.decode(errors='ignore').strip()}")
+
+
+# Output modes
+
+OUTPUT_MODES = ("burn", "soft", "preview")
+
+
+def create_subtitled_video(video_path, segments, srt_path, output_path, font_path,
+                           output_mode="burn", progress_callback=None, subtitle_title=None,
+                           preview_start=0.0, preview_duration=20.0, audio_background=None, media_info=None,
+                           **render_options):
+    """Deliver subtitles for one job: burn them in, mux `srt_path` as a soft track,
+    or render a short low-resolution preview starting at `preview_start`.
+
+    Audio-only inputs never reach the frame renderer: by default only the SRT
+    is produced, or with `audio_background` ("static"/"waveform") a lightweight
+    video is generated entirely in ffmpeg. media_info is the job's MediaInfo
+    for video_path and is passed on so no stage probes the file again.
+    """
+    if output_mode not in OUTPUT_MODES:
+        raise ValueError(f"Unknown output mode: {output_mode}")
+    media_info = media_info or probe_media(video_path)
+    if media_info.audio_only:
+        if audio_background:
+            render_audio_video(video_path, segments, output_path, font_path, background=audio_background,
+                               progress_callback=progress_callback,
+                               encoder_profile=render_options.get("encoder_profile", DEFAULT_ENCODER_PROFILE),
+                               media_info=media_info)
+        if progress_callback:
+            progress_callback(100)
+        return None
+    if output_mode == "preview":
+        return render_preview(video_path, segments, output_path, font_path, start=preview_start,
+                              duration=preview_duration, progress_callback=progress_callback,
+                              media_info=media_info)
+    if output_mode == "soft":
+        mux_soft_subtitles(video_path, srt_path, output_path, title=subtitle_title)
+        if progress_callback:
+            progress_callback(100)
+        return None
+    return render_subtitles_on_video(video_path, segments, output_path, font_path,
+                                     progress_callback=progress_callback, media_info=media_info, **render_options)
@@ -0,0 +1,69 @@
+import os
+import shutil
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+# The app is a flat set of top-level modules run from the repo root (fonts/ is relative to it)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+import media  # noqa: E402  (needs ROOT on sys.path)
+
+
+@pytest.fixture
+def ffmpeg():
+    if not (shutil.which("ffmpeg") and shutil.which("ffprobe")):
+        pytest.skip("ffmpeg/ffprobe not installed")
+
+
+@pytest.fixture
+def media_cache(tmp_path, monkeypatch):
+    """A private MEDIA_CACHE_DIR for the test."""
+    monkeypatch.setattr(media, "MEDIA_CACHE_DIR", str(tmp_path / "cache"))
+    return tmp_path / "cache"
+
+
+@pytest.fixture
+def make_clip(ffmpeg, media_cache, tmp_path):
+    """Factory for 25 fps H.264 clips with 2 B-frames, a fixed 50-frame GOP and an audio track."""
+    def make(seconds=12, name="source.mp4"):
+        path = str(tmp_path / name)
+        subprocess.run([
+            "ffmpeg", "-v", "error", "-y", "-f", "lavfi", "-i", "testsrc2=s=320x180:r=25",
+            "-f", "lavfi", "-i", "sine=f=440:sample_rate=44100", "-t", str(seconds),
+            "-c:v", "libx264", "-preset", "ultrafast", "-g", "50", "-keyint_min", "50", "-sc_threshold", "0",
+            "-bf", "2", "-pix_fmt", "yuv420p", "-c:a", "aac", path
+        ], check=True)
+        return path
+    return make
+
+
+@pytest.fixture
+def frame_hashes(ffmpeg):
+    """MD5 of every decoded video frame of a file, in order."""
+    def hashes(path):
+        result = subprocess.run(["ffmpeg", "-v", "error", "-i", str(path), "-map", "0:v:0", "-f", "framemd5", "-"],
+                                stdout=subprocess.PIPE, text=True, check=True)
+        return [line.split(",")[-1].strip() for line in result.stdout.splitlines() if not line.startswith("#")]
+    return hashes
+
+
+@pytest.fixture
+def decode_frames(ffmpeg):
+    """Every decoded video frame of a file as one (frames, height, width, 3) uint8 array."""
+    def decode(path):
+        info = media.probe_media(str(path))
+        result = subprocess.run(["ffmpeg", "-v", "error", "-i", str(path), "-map", "0:v:0",
+                                 "-f", "rawvideo", "-pix_fmt", "bgr24", "-"], stdout=subprocess.PIPE, check=True)
+        return np.frombuffer(result.stdout, np.uint8).reshape(-1, info.height, info.width, 3)
+    return decode
+
+
+@pytest.fixture
+def subtitle_segments():
+    """Two subtitles on the 12 s test clip: GOPs [0, 4) and [6, 8) carry text, [4, 6) and [8, 12) do not."""
+    return [{"start": 1.0, "end": 3.0, "text": "hello"}, {"start": 6.5, "end": 7.5, "text": "world"}]
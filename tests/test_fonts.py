@@ -0,0 +1,29 @@
+from subtitle_generator import DEFAULT_FONT, FONT_DIR, font_runs, get_font_for_text
+
+DEVANAGARI = f"{FONT_DIR}/NotoSansDevanagari-Regular.ttf"
+ARABIC = f"{FONT_DIR}/NotoSansArabic-Regular.ttf"
+
+
+def test_latin_text_is_one_default_run():
+    assert font_runs("Hello, world!") == [("Hello, world!", DEFAULT_FONT)]
+
+
+def test_mixed_scripts_get_a_font_per_run():
+    text = "Hello नमस्ते world"
+    runs = font_runs(text)
+    assert runs == [("Hello ", DEFAULT_FONT), ("नमस्ते", DEVANAGARI), (" world", DEFAULT_FONT)]
+    assert "".join(run for run, _ in runs) == text
+
+
+def test_digits_and_punctuation_stay_with_the_previous_run():
+    assert font_runs("مرحبا 123!") == [("مرحبا 123!", ARABIC)]
+
+
+def test_scripts_without_a_bundled_font_fall_back_and_merge():
+    # No CJK font ships in fonts/, so Japanese falls back to the default font
+    assert font_runs("Hi こんにちは") == [("Hi こんにちは", DEFAULT_FONT)]
+
+
+def test_get_font_for_text_picks_the_highest_priority_script():
+    assert get_font_for_text("नमस्ते مرحبا") == ARABIC
+    assert get_font_for_text("plain") == DEFAULT_FONT
@@ -0,0 +1,36 @@
+import os
+import time
+
+import pytest
+
+import media
+
+
+def test_keyframe_index_counts_frames_per_gop(make_clip):
+    index = media.get_keyframe_index(make_clip(seconds=5))
+    assert index["frame_count"] == 125
+    assert [k["time"] for k in index["keyframes"]] == [0.0, 2.0, 4.0]
+    assert [k["frames"] for k in index["keyframes"]] == [50, 50, 25]
+
+
+def test_failed_keyframe_scan_raises_and_is_not_cached(tmp_path, ffmpeg, media_cache):
+    broken = tmp_path / "broken.mp4"
+    broken.write_bytes(b"not a video")
+    with pytest.raises(ValueError):
+        media.get_keyframe_index(str(broken))
+    assert not os.listdir(media_cache / "keyframes")
+
+
+def test_evict_lru_removes_least_recently_used_until_within_budget(media_cache):
+    now = time.time()
+    for age, name in enumerate(["newest", "middle", "oldest"]):
+        path = media.cache_path("pcm", name, ".f32")
+        with open(path, "wb") as f:
+            f.write(b"\0" * 400 * 1024)
+        os.utime(path, (now - 3600 * age, now - 3600 * age))
+
+    assert media.evict_lru("pcm", ".f32", budget_mb=1) == 1
+    assert sorted(os.listdir(media_cache / "pcm")) == ["middle.f32", "newest.f32"]
+    # Entries used recently are kept even over budget
+    assert media.evict_lru("pcm", ".f32", budget_mb=0, min_idle_seconds=1800) == 1
+    assert os.listdir(media_cache / "pcm") == ["newest.f32"]
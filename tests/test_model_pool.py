@@ -0,0 +1,114 @@
+import time
+
+from torch import nn
+
+import transcription
+from model_pool import ModelPool, model_pool
+
+
+def small_model(model_size, device, quantized):
+    return nn.Linear(1000, 1000)  # about 3.8 MB of fp32 weights
+
+
+def test_reservations_count_against_the_budget():
+    pool = ModelPool(budget_mb=10, loader=small_model)
+    with pool.model("a"):
+        pass
+    held = pool.acquire("b")
+
+    pool.reserve("2 transcription workers", 4)
+    stats = pool.stats()
+    assert [m["model"] for m in stats["models"]] == ["b"]  # idle "a" made room; "b" is in use
+    assert stats["reserved"] == [{"name": "2 transcription workers", "mb": 4}]
+    assert stats["used_mb"] == 8
+    assert held is pool.acquire("b")
+
+    pool.unreserve("2 transcription workers")
+    assert pool.stats()["reserved"] == []
+
+
+def reserved_names():
+    return [r["name"] for r in model_pool.stats()["reserved"]]
+
+
+# No task is submitted in these tests, so no worker process starts
+def test_idle_transcription_pool_is_shut_down_and_unreserved(monkeypatch):
+    monkeypatch.setattr(transcription, "TRANSCRIBE_POOL_IDLE_SECONDS", 0.05)
+    pool = transcription._acquire_pool("tiny", "cpu", False, 2)
+    assert any(name.startswith("2 transcription workers") for name in reserved_names())
+
+    transcription._release_pool(pool)
+    time.sleep(0.3)
+    assert transcription._pools == {}
+    assert reserved_names() == []
+
+
+def test_pool_in_use_survives_a_settings_switch(monkeypatch):
+    monkeypatch.setattr(transcription, "TRANSCRIBE_POOL_IDLE_SECONDS", 60)
+    busy = transcription._acquire_pool("tiny", "cpu", False, 2)
+    idle = transcription._acquire_pool("base", "cpu", False, 1)
+    transcription._release_pool(idle)
+
+    other = transcription._acquire_pool("small", "cpu", False, 1)
+    # The idle "base" pool is retired for the new settings; the busy "tiny" one keeps running
+    assert not busy._shutdown_thread
+    assert sorted(key[0] for key in transcription._pools) == ["small", "tiny"]
+    assert not any("base" in name for name in reserved_names())
+    assert transcription._acquire_pool("tiny", "cpu", False, 2) is busy
+
+    for pool in (busy, busy, other):
+        transcription._release_pool(pool)
+    transcription._shutdown_idle_pool(None)
+    assert transcription._pools == {} and reserved_names() == []
+
+
+def test_reservation_is_held_until_the_workers_exit(monkeypatch):
+    monkeypatch.setattr(transcription, "TRANSCRIBE_POOL_IDLE_SECONDS", 60)
+    pool = transcription._acquire_pool("tiny", "cpu", False, 2)
+    shutdown, calls = pool.shutdown, []
+
+    def recording_shutdown(wait=True, **kwargs):
+        calls.append((wait, reserved_names()))
+        shutdown(wait=wait, **kwargs)
+    monkeypatch.setattr(pool, "shutdown", recording_shutdown)
+
+    transcription._release_pool(pool)
+    transcription._acquire_pool("base", "cpu", False, 1)  # retires the idle "tiny" pool
+    assert calls == [(True, ["2 transcription workers (tiny, cpu)"])]
+    assert not any("tiny" in name for name in reserved_names())
+
+    transcription._release_pool(transcription._pools[("base", "cpu", False, 1)]["pool"])
+    transcription._shutdown_idle_pool(None)
+
+
+def test_mmap_model_round_trip_without_random_init(tmp_path, monkeypatch):
+    import torch
+    import whisper
+    import model_pool as pool_module
+    from whisper.model import ModelDimensions, Whisper
+
+    dims = ModelDimensions(n_mels=80, n_audio_ctx=32, n_audio_state=64, n_audio_head=2, n_audio_layer=2,
+                           n_vocab=100, n_text_ctx=16, n_text_state=64, n_text_head=2, n_text_layer=2)
+    torch.manual_seed(0)
+    original = Whisper(dims).eval()
+    with torch.no_grad():
+        for param in original.parameters():  # some are left as torch.empty by Whisper
+            param.normal_(std=0.02)
+    monkeypatch.setattr(whisper, "load_model", lambda *args, **kwargs: original)
+    monkeypatch.setattr(pool_module, "MMAP_MODEL_DIR", str(tmp_path))
+    pool_module.convert_checkpoint("test")
+
+    def no_init(self, dims):
+        raise AssertionError("load_mmap_model must not allocate a randomly initialised model")
+
+    monkeypatch.setattr(Whisper, "__init__", no_init)
+    loaded = pool_module.load_mmap_model("test").eval()
+
+    assert not any(t.is_meta for t in list(loaded.parameters()) + list(loaded.buffers()))
+    # Every weight points into the one mapped file
+    assert len({p.untyped_storage().data_ptr() for p in loaded.parameters()}) == 1
+    assert torch.equal(loaded.alignment_heads.to_dense(), original.alignment_heads.to_dense())
+    mel = torch.randn(1, 80, 64)
+    tokens = torch.tensor([[1, 2, 3]])
+    with torch.no_grad():
+        assert torch.allclose(loaded(mel, tokens), original(mel, tokens))
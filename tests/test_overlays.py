@@ -0,0 +1,38 @@
+import numpy as np
+
+from subtitle_generator import OverlayCache, build_subtitle_overlay, subtitle_font_size
+
+
+def test_overlay_masks_are_uint8_and_blend_like_float():
+    overlay = build_subtitle_overlay("Hello world, outline blending", 1280, 720, subtitle_font_size(1280))
+    assert overlay.keep.dtype == np.uint8 and overlay.add.dtype == np.uint8
+
+    frame = np.random.default_rng(0).integers(0, 256, (720, 1280, 3), dtype=np.uint8)
+    h, w = overlay.keep.shape[:2]
+    roi = frame[overlay.y:overlay.y + h, overlay.x:overlay.x + w].astype(np.float64)
+    expected = np.clip(np.rint(roi * overlay.keep / 255.0 + overlay.add), 0, 255)
+    overlay.apply(frame)
+    assert np.abs(frame[overlay.y:overlay.y + h, overlay.x:overlay.x + w] - expected).max() <= 1
+
+
+def test_overlay_cache_keeps_only_recent_entries():
+    cache = OverlayCache(None, 640, 360, max_entries=2)
+    first = cache.get("one")
+    cache.get("two")
+    assert cache.get("one") is first  # still cached, now most recent
+    cache.get("three")  # evicts "two"
+    assert list(cache._overlays) == ["one", "three"]
+
+
+def test_preview_overlays_match_the_full_render_layout():
+    text = "A subtitle line long enough to wrap onto two lines at a narrow width"
+    full = build_subtitle_overlay(text, 1920, 1080, subtitle_font_size(1920))
+    preview = OverlayCache(None, 640, 360, layout_size=(1920, 1080)).get(text)
+    assert preview.keep.dtype == np.uint8 and preview.add.dtype == np.uint8
+
+    # Same box as the full render, a third of the size
+    full_h, full_w = full.keep.shape[:2]
+    h, w = preview.keep.shape[:2]
+    assert abs(preview.x - full.x / 3) <= 1 and abs(preview.y - full.y / 3) <= 1
+    assert abs(w - full_w / 3) <= 1 and abs(h - full_h / 3) <= 1
+    assert preview.x + w <= 640 and preview.y + h <= 360
@@ -0,0 +1,78 @@
+import numpy as np
+
+import transcription
+from media import open_pcm
+from transcription import SAMPLE_RATE, _stitch, split_at_silence
+
+
+def pcm_file(tmp_path, samples):
+    path = tmp_path / "audio.f32"
+    samples.astype(np.float32).tofile(path)
+    return open_pcm(str(path))
+
+
+def test_split_at_silence_cuts_in_the_quiet_gaps(tmp_path):
+    samples = np.random.default_rng(0).uniform(-0.5, 0.5, 180 * SAMPLE_RATE)
+    for gap in (55.0, 126.0):  # within SILENCE_SEARCH_SECONDS of the 60 s and 120 s targets
+        samples[int(gap * SAMPLE_RATE):int((gap + 0.5) * SAMPLE_RATE)] = 0.0
+    audio = pcm_file(tmp_path, samples)
+
+    cuts = split_at_silence(audio, 3)
+
+    assert cuts[0] == 0 and cuts[-1] == len(audio)
+    assert 55.0 <= cuts[1] / SAMPLE_RATE <= 55.5
+    assert 126.0 <= cuts[2] / SAMPLE_RATE <= 126.5
+
+
+def test_split_at_silence_single_chunk(tmp_path):
+    audio = pcm_file(tmp_path, np.zeros(5 * SAMPLE_RATE))
+    assert split_at_silence(audio, 1) == [0, len(audio)]
+
+
+def test_stitch_drops_repeats_across_the_seam():
+    previous = {"start": 50.0, "end": 59.8, "text": " Hello there."}
+    segments = [{"start": 59.5, "end": 60.4, "text": "hello  there."},
+                {"start": 60.4, "end": 62.0, "text": " Next line."}]
+    assert [seg["text"] for seg in _stitch(previous, segments)] == [" Next line."]
+
+
+def test_stitch_keeps_time_moving_forward():
+    previous = {"start": 50.0, "end": 60.2, "text": " Before the seam."}
+    segments = [{"start": 59.9, "end": 61.0, "text": " After."},
+                {"start": 60.5, "end": 60.9, "text": " Swallowed."},
+                {"start": 61.0, "end": 62.0, "text": " Kept."}]
+    stitched = _stitch(previous, segments)
+    assert [(seg["start"], seg["end"], seg["text"]) for seg in stitched] == [
+        (60.2, 61.0, " After."), (61.0, 62.0, " Kept.")]
+
+
+def test_stitch_first_chunk_is_unchanged():
+    segments = [{"start": 0.0, "end": 1.0, "text": " One."}, {"start": 1.0, "end": 2.0, "text": " Two."}]
+    assert _stitch(None, [dict(seg) for seg in segments]) == segments
+
+
+class RecordingModel:
+    """Stands in for a Whisper model: one segment per 10 s of whatever window it is given."""
+
+    def __init__(self):
+        self.window_lengths = []
+
+    def transcribe(self, audio, language=None, initial_prompt=None, **options):
+        seconds = len(audio) / SAMPLE_RATE
+        self.window_lengths.append(seconds)
+        starts = np.arange(0.0, seconds, 10.0)
+        return {"language": language or "en",
+                "segments": [{"start": s, "end": min(s + 10.0, seconds), "text": f" {s:.0f}"} for s in starts]}
+
+
+def test_chunk_workers_read_one_window_at_a_time(tmp_path, monkeypatch):
+    audio = pcm_file(tmp_path, np.zeros(300 * SAMPLE_RATE))
+    model = RecordingModel()
+    monkeypatch.setattr(transcription, "_worker_model", model)
+
+    segments = transcription._transcribe_chunk(audio.filename, 60 * SAMPLE_RATE, 250 * SAMPLE_RATE, "en", {})
+
+    assert max(model.window_lengths) <= transcription.STREAM_WINDOW_SECONDS
+    # Absolute, contiguous times covering the chunk; cut segments are re-read, never duplicated
+    assert segments[0]["start"] == 60.0 and segments[-1]["end"] == 250.0
+    assert all(a["end"] == b["start"] for a, b in zip(segments, segments[1:]))
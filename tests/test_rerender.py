@@ -0,0 +1,58 @@
+import numpy as np
+
+import subtitle_generator
+from subtitle_generator import render_subtitles_on_video, rerender_after_edit, retranslate_edited_segments
+
+
+def test_rerender_after_edit_replaces_only_the_changed_gop(tmp_path, make_clip, frame_hashes, decode_frames,
+                                                          subtitle_segments):
+    source = make_clip()
+    output = str(tmp_path / "out.mp4")
+    render_subtitles_on_video(source, subtitle_segments, output, None, mode="smart", workers=2)
+    before = frame_hashes(output)
+
+    edited = [subtitle_segments[0], dict(subtitle_segments[1], text="edited")]
+    summary = rerender_after_edit(source, output, edited, workers=2)
+
+    assert summary == {"copied_seconds": 10.0, "encoded_seconds": 2.0}
+    after = frame_hashes(output)
+    assert len(after) == len(before) == 300
+    # Only the GOP at [6, 8) holds the edited segment
+    assert after[:150] == before[:150] and after[200:] == before[200:]
+    assert after[162:188] != before[162:188]
+    # The re-encoded GOP stays on its source frames above the subtitle band
+    source_frames, output_frames = decode_frames(source)[:, :100], decode_frames(output)[:, :100]
+    for i in range(150, 200):
+        diff = np.abs(output_frames[i].astype(np.int16) - source_frames[i]).mean()
+        shifted = np.abs(output_frames[i].astype(np.int16) - source_frames[i - 1]).mean()
+        assert diff < 4.0 and diff < shifted, f"frame {i}: {diff:.2f} vs previous {shifted:.2f}"
+
+
+def test_rerender_without_changes_keeps_the_output(tmp_path, make_clip, frame_hashes, subtitle_segments):
+    source = make_clip()
+    output = str(tmp_path / "out.mp4")
+    render_subtitles_on_video(source, subtitle_segments, output, None, mode="smart", workers=2)
+    before = frame_hashes(output)
+
+    assert rerender_after_edit(source, output, subtitle_segments)["encoded_seconds"] == 0.0
+    assert frame_hashes(output) == before
+
+
+def test_retranslate_edited_segments_only_translates_changes(monkeypatch):
+    translated = []
+
+    def fake_translate(segment, target_lang):
+        translated.append(segment["text"])
+        return {"start": segment["start"], "end": segment["end"], "text": f"{target_lang}:{segment['text']}"}
+
+    monkeypatch.setattr(subtitle_generator, "translate_segment_parallel", fake_translate)
+    old_source = [{"start": 0.0, "end": 1.0, "text": "one"}, {"start": 1.0, "end": 2.0, "text": "two"},
+                  {"start": 2.0, "end": 3.0, "text": "three"}]
+    old_translated = [dict(seg, text=f"fr:{seg['text']}") for seg in old_source]
+    new_source = [old_source[0], {"start": 1.0, "end": 2.0, "text": "TWO"}, {"start": 2.0, "end": 3.5, "text": "three"}]
+
+    result = retranslate_edited_segments(old_source, new_source, old_translated, "fr")
+
+    assert translated == ["TWO", "three"]  # the edited text and the retimed segment
+    assert [seg["text"] for seg in result] == ["fr:one", "fr:TWO", "fr:three"]
+    assert result[2]["end"] == 3.5
@@ -0,0 +1,50 @@
+import numpy as np
+
+from subtitle_generator import _gop_runs, render_subtitles_on_video
+
+
+def _keyframes(times, frames=50):
+    return [{"time": t, "pos": None, "frames": frames} for t in times]
+
+
+def test_gop_runs_merge_neighbours_and_carry_frame_counts():
+    runs = _gop_runs(_keyframes([0.0, 2.0, 4.0, 6.0, 8.0]), 10.0, lambda start, end: 2.0 <= start < 6.0)
+    assert runs == [(0.0, 2.0, False, 50), (2.0, 6.0, True, 100), (6.0, None, False, 100)]
+
+
+def test_gop_runs_fold_duplicate_and_trailing_keyframes():
+    keyframes = _keyframes([0.0, 0.0, 4.0, 10.0], frames=10)
+    runs = _gop_runs(keyframes, 10.0, lambda start, end: False)
+    assert runs == [(0.0, None, False, 40)]
+
+
+def test_gop_runs_start_at_zero():
+    runs = _gop_runs(_keyframes([0.04, 2.04]), 4.0, lambda start, end: start == 0.0)
+    assert runs == [(0.0, 2.04, True, 50), (2.04, None, False, 50)]
+
+
+def test_smart_render_keeps_every_frame_in_place(tmp_path, make_clip, frame_hashes, subtitle_segments):
+    source = make_clip()
+    output = str(tmp_path / "smart.mp4")
+
+    stats = render_subtitles_on_video(source, subtitle_segments, output, None, mode="smart", workers=2)
+
+    assert stats == {"copied_seconds": 6.0, "encoded_seconds": 6.0}
+    source_frames, output_frames = frame_hashes(source), frame_hashes(output)
+    assert len(output_frames) == len(source_frames) == 300
+    # GOPs without subtitles ([4, 6) and [8, 12)) are copied bit-exact to the same frame numbers
+    assert output_frames[100:150] == source_frames[100:150]
+    assert output_frames[200:] == source_frames[200:]
+
+
+def test_smart_render_encoded_gops_stay_on_their_source_frames(tmp_path, make_clip, decode_frames, subtitle_segments):
+    source = make_clip()
+    output = str(tmp_path / "smart.mp4")
+    render_subtitles_on_video(source, subtitle_segments, output, None, mode="smart", workers=2)
+
+    # testsrc2 changes every frame; above the subtitle band frame i must match source frame i, not i - 1
+    source_frames, output_frames = decode_frames(source)[:, :100], decode_frames(output)[:, :100]
+    for i in (*range(1, 100), *range(150, 200)):
+        diff = np.abs(output_frames[i].astype(np.int16) - source_frames[i]).mean()
+        shifted = np.abs(output_frames[i].astype(np.int16) - source_frames[i - 1]).mean()
+        assert diff < 4.0 and diff < shifted, f"frame {i}: {diff:.2f} vs previous {shifted:.2f}"
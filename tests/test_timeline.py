@@ -0,0 +1,42 @@
+import numpy as np
+
+from subtitle_generator import SubtitleTimeline
+
+SEGMENTS = [
+    {"start": 4.0, "end": 6.0, "text": "third"},
+    {"start": 0.0, "end": 2.0, "text": "first"},
+    {"start": 1.5, "end": 3.0, "text": "second"},
+]
+
+
+def test_lookup_sorts_segments_and_hands_over_on_overlap():
+    timeline = SubtitleTimeline(SEGMENTS)
+    assert timeline.texts == ["first", "second", "third"]
+    assert timeline.text_at(1.0) == "first"
+    assert timeline.text_at(1.5) == "second"  # the later segment wins once it starts
+    assert timeline.text_at(3.5) == ""
+    assert timeline.text_at(6.0) == "third"  # ends are inclusive
+    assert timeline.text_at(6.01) == ""
+    assert timeline.index_at(-1.0) == -1
+
+
+def test_frame_indices_match_per_frame_lookup():
+    timeline = SubtitleTimeline(SEGMENTS)
+    fps, start = 25, 0.52
+    indices = timeline.frame_indices(fps, 200, start)
+    expected = [timeline.index_at(start + i / fps) for i in range(200)]
+    assert indices.tolist() == expected
+
+
+def test_segments_between():
+    timeline = SubtitleTimeline(SEGMENTS)
+    assert [s["text"] for s in timeline.segments_between(2.5, 4.0)] == ["second"]
+    assert [s["text"] for s in timeline.segments_between(3.2, 3.9)] == []
+    assert [s["text"] for s in timeline.segments_between(5.0)] == ["third"]
+    assert not timeline.has_subtitle_between(6.5, 10.0)
+
+
+def test_empty_timeline():
+    timeline = SubtitleTimeline([])
+    assert timeline.indices_at(np.array([0.0, 1.0])).tolist() == [-1, -1]
+    assert timeline.segments_between(0.0, 10.0) == []
@@ -0,0 +1,420 @@
+import os
+import json
+import hashlib
+import threading
+import numpy as np
+import whisper
+from model_pool import model_pool
+from media import file_content_hash, cache_path, write_json_atomic, evict_lru, extract_pcm, read_pcm, worker_pool
+
+SAMPLE_RATE = whisper.audio.SAMPLE_RATE  # matches media.PCM_SAMPLE_RATE
+
+# Streaming transcription
+# The shared PCM file is transcribed one 30 s window (Whisper's own context
+# length) at a time and each window is yielded as soon as it is done, so the
+# first subtitles are available after one decoder pass instead of after the
+# whole file. A segment that runs into the window edge may be cut mid-word,
+# so it is dropped and the next window starts again from its beginning; that
+# re-read span is the overlap between consecutive windows. Only the current
+# window is ever in memory, so peak memory does not grow with media length.
+
+STREAM_WINDOW_SECONDS = 30.0
+PROMPT_SEGMENTS = 3  # trailing segments passed on as context to the next window
+
+
+def _transcribe_windows(model, pcm_path, start, end, language=None, window_seconds=STREAM_WINDOW_SECONDS,
+                        **options):
+    """Transcribe samples [start, end) of an extracted PCM file one window at a time.
+
+    Yields (segments with absolute times, language, samples consumed up to) per window.
+    """
+    window = int(window_seconds * SAMPLE_RATE)
+    offset = start
+    prompt = None
+    while offset < end:
+        stop = min(offset + window, end)
+        last = stop == end
+        result = model.transcribe(read_pcm(pcm_path, offset, stop), language=language,
+                                  initial_prompt=prompt, **options)
+        language = language or result.get("language")
+        segments = [seg for seg in result["segments"] if seg["text"].strip()]
+
+        consumed = stop - offset
+        if not last and len(segments) > 1 and segments[-1]["start"] > 0:
+            consumed = min(consumed, int(segments.pop()["start"] * SAMPLE_RATE))
+
+        base = offset / SAMPLE_RATE
+        limit = consumed / SAMPLE_RATE
+        new_segments = [{
+            "start": base + seg["start"],
+            "end": base + min(seg["end"], limit),
+            "text": seg["text"]
+        } for seg in segments]
+        if new_segments:
+            prompt = " ".join(seg["text"].strip() for seg in new_segments[-PROMPT_SEGMENTS:])
+
+        offset += consumed
+        yield new_segments, language, offset
+
+
+def stream_transcription(model, audio_path, language=None, window_seconds=STREAM_WINDOW_SECONDS, **options):
+    """Transcribe audio_path window by window, yielding each window's results as it finishes.
+
+    Each yielded dict has the window's new "segments" (start/end/text with
+    absolute times), the spoken "language" (detected on the first window and
+    then held fixed) and the "position" in seconds transcribed so far.
+    """
+    samples = extract_pcm(audio_path)
+    if not len(samples):
+        return
+    for segments, language, offset in _transcribe_windows(model, samples.filename, 0, len(samples), language,
+                                                           window_seconds, **options):
+        yield {"segments": segments, "language": language, "position": offset / SAMPLE_RATE}
+
+
+def transcribe_streaming(model, audio_path, language=None, on_window=None, **options):
+    """Run stream_transcription to the end and return a whisper-style result dict."""
+    segments = []
+    detected = language
+    for window in stream_transcription(model, audio_path, language=language, **options):
+        segments.extend(window["segments"])
+        detected = window["language"]
+        if on_window:
+            on_window(window)
+    return {"segments": segments, "language": detected, "text": "".join(seg["text"] for seg in segments)}
+
+
+# Parallel chunked transcription
+# On CPU-only nodes one transcribe call leaves most cores idle. The audio is
+# cut at the quietest points near equal-length boundaries and the chunks are
+# transcribed in a process pool whose workers each hold a loaded model. Every
+# worker copy costs RAM, so the worker count is capped by a memory budget.
+# Workers walk their chunk in the same 30 s windows as streaming transcription,
+# so a worker's memory does not grow with the chunk (and media) length. The
+# workers' model copies are reserved against the model pool's budget while the
+# pool is up. There is one pool per settings, shared by the jobs using them and
+# never stopped while a job holds it; a pool no job has used for
+# TRANSCRIBE_POOL_IDLE_SECONDS (or an idle one when other settings need
+# workers) is shut down, and its reservation dropped once its processes exit.
+
+SILENCE_FRAME_SECONDS = 0.1
+SILENCE_SEARCH_SECONDS = 10.0
+MIN_CHUNK_SECONDS = 60.0
+SEAM_TOLERANCE_SECONDS = 1.0
+# Approximate resident size of one worker (weights plus activations), in MB
+MODEL_MEMORY_MB = {"tiny": 400, "base": 600, "small": 1200, "medium": 3000, "large": 6000}
+TRANSCRIBE_POOL_IDLE_SECONDS = int(os.getenv("TRANSCRIBE_POOL_IDLE_SECONDS", 300))
+
+_worker_model = None
+_pools = {}  # (model_size, device, quantized, workers) -> {"pool", "reservation", "jobs", "timer"}
+_pool_lock = threading.Lock()
+
+
+def _worker_mb(model_size, quantized=False):
+    per_worker = MODEL_MEMORY_MB.get(model_size.split("-")[0], MODEL_MEMORY_MB["large"])
+    return per_worker // 3 if quantized else per_worker  # int8 linear weights
+
+
+def transcription_workers(model_size, workers=None, memory_budget_mb=None, quantized=False):
+    """Worker count from the argument/TRANSCRIBE_WORKERS, capped by the memory budget."""
+    workers = workers or int(os.getenv("TRANSCRIBE_WORKERS", 0)) or max(1, (os.cpu_count() or 1) // 4)
+    budget = memory_budget_mb or int(os.getenv("TRANSCRIBE_MEMORY_MB", 0))
+    if budget:
+        workers = min(workers, max(1, budget // _worker_mb(model_size, quantized)))
+    return workers
+
+
+def split_at_silence(samples, chunk_count, search_seconds=SILENCE_SEARCH_SECONDS):
+    """Sample offsets cutting samples (a media.extract_pcm memmap) into up to chunk_count pieces
+    at the quietest nearby points."""
+    frame = int(SILENCE_FRAME_SECONDS * SAMPLE_RATE)
+    frames = len(samples) // frame
+    if chunk_count <= 1 or frames < 2:
+        return [0, len(samples)]
+
+    # One minute at a time so a multi-hour file is never resident all at once
+    block = 600
+    rms = np.concatenate([
+        np.sqrt(np.mean(np.square(read_pcm(samples.filename, i * frame, min(i + block, frames) * frame)
+                                  .reshape(-1, frame)), axis=1))
+        for i in range(0, frames, block)])
+    radius = int(search_seconds / SILENCE_FRAME_SECONDS)
+    cuts = [0]
+    for i in range(1, chunk_count):
+        target = frames * i // chunk_count
+        lo = max(target - radius, cuts[-1] // frame + 1)
+        hi = min(target + radius, frames)
+        if lo < hi:
+            cuts.append((lo + int(np.argmin(rms[lo:hi]))) * frame + frame // 2)
+    cuts.append(len(samples))
+    return cuts
+
+
+def _init_worker(model_size, device, quantized, threads):
+    global _worker_model
+    import torch
+    torch.set_num_threads(threads)
+    # Held for the worker's lifetime; the pool keeps the cache location and loading in one place
+    _worker_model = model_pool.acquire(model_size, device, quantized)
+
+
+def _detect_language(pcm_path, end):
+    samples = read_pcm(pcm_path, 0, min(end, whisper.audio.N_SAMPLES))  # Whisper only looks at 30 s
+    mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(samples), _worker_model.dims.n_mels)
+    _, probs = _worker_model.detect_language(mel.to(_worker_model.device))
+    return max(probs, key=probs.get)
+
+
+def _transcribe_chunk(pcm_path, start, end, language, options):
+    # Workers read the parent's PCM file themselves; only offsets cross the process boundary
+    segments = []
+    for window_segments, _, _ in _transcribe_windows(_worker_model, pcm_path, start, end, language, **options):
+        segments.extend(window_segments)
+    return segments
+
+
+def _retire_pool(entry):
+    """Stop a pool no job holds; its reservation is dropped once the worker processes have exited."""
+    entry["pool"].shutdown(wait=True)
+    model_pool.unreserve(entry["reservation"])
+
+
+def _take_idle_pools(key=None):
+    """Remove the idle pool for key (or every idle pool) from _pools and return them. Caller holds _pool_lock."""
+    idle = [k for k, entry in _pools.items() if entry["jobs"] == 0 and key in (None, k)]
+    for k in idle:
+        if _pools[k]["timer"] is not None:
+            _pools[k]["timer"].cancel()
+    return [_pools.pop(k) for k in idle]
+
+
+def _shutdown_idle_pool(key):
+    with _pool_lock:
+        idle = _take_idle_pools(key)
+    for entry in idle:
+        _retire_pool(entry)
+
+
+def _acquire_pool(model_size, device, quantized, workers):
+    """Share one pool (and its loaded models) across jobs with the same settings; pair with _release_pool(pool)."""
+    key = (model_size, device, quantized, workers)
+    with _pool_lock:
+        idle = [] if key in _pools else _take_idle_pools()
+    # Idle pools for other settings give their memory back before new workers load
+    for entry in idle:
+        _retire_pool(entry)
+
+    with _pool_lock:
+        entry = _pools.get(key)
+        if entry is None:
+            reservation = f"{workers} transcription workers ({model_size}{' int8' if quantized else ''}, {device})"
+            model_pool.reserve(reservation, workers * _worker_mb(model_size, quantized))
+            threads = max(1, (os.cpu_count() or 1) // workers)
+            pool = worker_pool(workers, initializer=_init_worker, initargs=(model_size, device, quantized, threads))
+            entry = _pools[key] = {"pool": pool, "reservation": reservation, "jobs": 0, "timer": None}
+        elif entry["timer"] is not None:
+            entry["timer"].cancel()
+            entry["timer"] = None
+        entry["jobs"] += 1
+        return entry["pool"]
+
+
+def _release_pool(pool):
+    with _pool_lock:
+        key, entry = next((k, e) for k, e in _pools.items() if e["pool"] is pool)
+        entry["jobs"] -= 1
+        if entry["jobs"] == 0:
+            entry["timer"] = threading.Timer(TRANSCRIBE_POOL_IDLE_SECONDS, _shutdown_idle_pool, args=(key,))
+            entry["timer"].daemon = True
+            entry["timer"].start()
+
+
+def _normalize(text):
+    return " ".join(text.lower().split())
+
+
+def _stitch(previous, segments):
+    """Drop segments repeated across a seam and keep times from running backwards."""
+    stitched = []
+    for seg in segments:
+        last = stitched[-1] if stitched else previous
+        if last is not None:
+            if seg["start"] < last["end"] + SEAM_TOLERANCE_SECONDS and _normalize(seg["text"]) == _normalize(last["text"]):
+                continue
+            seg["start"] = max(seg["start"], last["end"])
+            if seg["end"] <= seg["start"]:
+                continue
+        stitched.append(seg)
+    return stitched
+
+
+def stream_parallel_transcription(audio_path, model_size, device="cpu", language=None, workers=None,
+                                  memory_budget_mb=None, quantized=False, **options):
+    """Transcribe silence-split chunks in worker processes, yielding chunks in order as they finish.
+
+    Yields the same dicts as stream_transcription, with absolute timestamps.
+    """
+    workers = transcription_workers(model_size, workers, memory_budget_mb, quantized)
+    samples = extract_pcm(audio_path)
+    if not len(samples):
+        return
+    chunk_count = max(1, min(workers, int(len(samples) / SAMPLE_RATE // MIN_CHUNK_SECONDS)))
+    cuts = split_at_silence(samples, chunk_count)
+    pool = _acquire_pool(model_size, device, quantized, workers)
+    try:
+        # Chunks must agree on the language, so detect it once up front
+        if language is None:
+            language = pool.submit(_detect_language, samples.filename, cuts[1]).result()
+
+        futures = [pool.submit(_transcribe_chunk, samples.filename, start, end, language, options)
+                   for start, end in zip(cuts, cuts[1:])]
+        previous = None
+        for end, future in zip(cuts[1:], futures):
+            segments = _stitch(previous, future.result())  # absolute times, ending within the chunk
+            previous = segments[-1] if segments else previous
+            yield {"segments": segments, "language": language, "position": end / SAMPLE_RATE}
+    finally:
+        _release_pool(pool)
+
+
+def transcribe_parallel(audio_path, model_size, device="cpu", language=None, workers=None,
+                        memory_budget_mb=None, quantized=False, **options):
+    """Run stream_parallel_transcription to the end and return a whisper-style result dict."""
+    segments = []
+    for window in stream_parallel_transcription(audio_path, model_size, device, language, workers,
+                                                memory_budget_mb, quantized, **options):
+        segments.extend(window["segments"])
+        language = window["language"]
+    return {"segments": segments, "language": language, "text": "".join(seg["text"] for seg in segments)}
+
+
+# Transcript cache
+# Transcripts are stored under the media cache keyed by the audio's content
+# hash plus everything that changes Whisper's output (model size, spoken
+# language setting, decode options). Entries are JSON files whose mtime is
+# bumped on every hit, so eviction drops the least recently used first once
+# the directory grows past TRANSCRIPT_CACHE_MB.
+
+TRANSCRIPT_CACHE_MB = int(os.getenv("TRANSCRIPT_CACHE_MB", 256))
+
+_cache_stats = {"hits": 0, "misses": 0, "evictions": 0}
+_cache_lock = threading.Lock()
+
+
+def transcript_cache_key(audio_path, model_size, language=None, **options):
+    """Cache key for one transcription of audio_path with the given settings."""
+    settings = {"audio": file_content_hash(audio_path), "model": model_size,
+                "language": language, "options": options}
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode()).hexdigest()
+
+
+def _count(stat, amount=1):
+    with _cache_lock:
+        _cache_stats[stat] += amount
+
+
+def load_cached_transcript(key):
+    """The cached {"segments", "language"} for key, or None on a miss."""
+    path = cache_path("transcripts", key, ".json")
+    try:
+        with open(path, encoding="utf-8") as f:
+            transcript = json.load(f)
+        os.utime(path)  # mark as recently used
+    except (OSError, ValueError):
+        _count("misses")
+        return None
+    _count("hits")
+    return transcript
+
+
+def store_cached_transcript(key, transcript):
+    write_json_atomic(cache_path("transcripts", key, ".json"), transcript)
+    _evict_transcripts()
+
+
+def _evict_transcripts():
+    _count("evictions", evict_lru("transcripts", ".json", TRANSCRIPT_CACHE_MB))
+
+
+def transcript_cache_stats():
+    """Hit/miss/eviction counters for this process plus the cache's current size."""
+    directory = os.path.dirname(cache_path("transcripts", "", ""))
+    sizes = [os.path.getsize(os.path.join(directory, name))
+             for name in os.listdir(directory) if name.endswith(".json")]
+    with _cache_lock:
+        stats = dict(_cache_stats)
+    stats.update(entries=len(sizes), size_mb=round(sum(sizes) / (1024 * 1024), 1))
+    return stats
+
+
+def cache_transcription(windows, key):
+    """Pass windows through, storing the whole transcript once the last one has arrived."""
+    segments = []
+    language = None
+    for window in windows:
+        segments.extend(window["segments"])
+        language = window["language"]
+        yield window
+    store_cached_transcript(key, {"segments": segments, "language": language})
+
+
+# Memory reporting
+# A background thread samples resident memory from /proc while a job runs so
+# the peak per job (not the process lifetime maximum that getrusage reports)
+# can be used to size workers. Pool worker processes are children of this
+# process and are counted in the total.
+
+RSS_SAMPLE_SECONDS = 0.2
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _rss_bytes(pid="self"):
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def _child_pids():
+    pids = []
+    try:
+        for tid in os.listdir("/proc/self/task"):
+            with open(f"/proc/self/task/{tid}/children") as f:
+                pids.extend(f.read().split())
+    except OSError:
+        pass
+    return pids
+
+
+class PeakMemory:
+    """Context manager tracking peak RSS of this process and of it plus its children, in MB."""
+
+    def __init__(self, interval=RSS_SAMPLE_SECONDS):
+        self.interval = interval
+        self.peak_rss_mb = 0.0
+        self.peak_total_rss_mb = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        own = _rss_bytes()
+        total = own + sum(_rss_bytes(pid) for pid in _child_pids())
+        self.peak_rss_mb = max(self.peak_rss_mb, own / (1024 * 1024))
+        self.peak_total_rss_mb = max(self.peak_total_rss_mb, total / (1024 * 1024))
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self):
+        self._sample()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+        return False